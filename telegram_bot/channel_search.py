@@ -3,24 +3,33 @@ Channel Search Module
 Handles initial historical search of channels
 """
 import asyncio
+from itertools import compress
 from telethon.errors import FloodWaitError
 from email_templates_file import EmailTemplate, BotFilter
 from email_service import EmailService
 
+# Maximum messages per batch email (bounds the size of each rendered report)
+EMAIL_BATCH_SIZE = 200
+
 
 class ChannelSearcher:
     """Handles initial search through channel history"""
     
-    def __init__(self, client, state):
+    def __init__(self, client, state, mark_dirty_callback=None, resolve_entity_callback=None):
         """
         Initialize searcher
         
         Args:
             client: Telethon client instance
             state: State dictionary with initialized_channels and last_message_ids
+            mark_dirty_callback: Optional function called whenever state is modified
+            resolve_entity_callback: Optional async function resolving a username
+                to an entity (default: client.get_entity)
         """
         self.client = client
         self.state = state
+        self.mark_dirty_callback = mark_dirty_callback
+        self.resolve_entity = resolve_entity_callback or client.get_entity
     
     async def initial_search(self, config, ensure_connected_callback=None):
         """
@@ -53,7 +62,7 @@ class ChannelSearcher:
             if channel_username.startswith('@'):
                 channel_username = channel_username[1:]
             
-            entity = await self.client.get_entity(channel_username)
+            entity = await self.resolve_entity(channel_username)
             channel_id = entity.id
             
             # Store with both ID formats (positive and -100 prefix)
@@ -61,7 +70,8 @@ class ChannelSearcher:
             
             # Check if already initialized
             if channel_id in self.state['initialized_channels']:
-                print(f"   ⏭️  Already searched, skipping initial search")
+                print(f"   ⏭️  Already searched, fetching only newer messages")
+                await self._catch_up(entity, config, channel_id, event_id)
                 return channel_id
             
             # Extract search keywords from filter
@@ -76,6 +86,9 @@ class ChannelSearcher:
             matched_messages = []
             seen_message_ids = set()
             
+            # If only initialized_channels was lost, skip what was already seen
+            min_id = self.state['last_message_ids'].get(channel_id, 0)
+            
             # Search for keywords
             if search_keywords:
                 print(f"   🔎 Searching for {len(search_keywords)} keywords")
@@ -84,6 +97,8 @@ class ChannelSearcher:
                 for idx, keyword in enumerate(search_keywords, 1):
                     print(f"      [{idx}/{len(search_keywords)}] Searching: '{keyword}'...")
                     
+                    # Unseen results are filtered together once the page is in
+                    candidates = []
                     try:
                         # Ensure connected before each search
                         if ensure_connected_callback:
@@ -94,23 +109,20 @@ class ChannelSearcher:
                         async for message in self.client.iter_messages(
                             entity, 
                             limit=search_limit,
-                            search=keyword
+                            search=keyword,
+                            min_id=min_id
                         ):
                             if message.text and message.id not in seen_message_ids:
-                                if BotFilter.apply_filter(message.text, filter_config):
-                                    matched_messages.append({
-                                        'date': message.date.strftime('%Y-%m-%d %H:%M:%S'),
-                                        'text': message.text,
-                                        'id': message.id
-                                    })
-                                    seen_message_ids.add(message.id)
+                                seen_message_ids.add(message.id)
+                                candidates.append(message)
                     
                     except FloodWaitError as e:
                         print(f"      ⏸️  Flood wait: {e.seconds}s, waiting...")
                         await asyncio.sleep(e.seconds)
                     except Exception as e:
                         print(f"      ⚠️  Error searching '{keyword}': {e}")
-                        continue
+                    
+                    matched_messages.extend(self._filter_messages(candidates, filter_config))
                 
                 matched_messages.sort(key=lambda x: x['date'], reverse=True)
                 print(f"   ✅ Found {len(matched_messages)} unique messages")
@@ -118,33 +130,16 @@ class ChannelSearcher:
             else:
                 # No keywords - get recent messages
                 print(f"   ℹ️  No search keyword, getting recent messages...")
-                messages = await self.client.get_messages(entity, limit=50)
-                
-                for message in messages:
-                    if message.text and BotFilter.apply_filter(message.text, filter_config):
-                        matched_messages.append({
-                            'date': message.date.strftime('%Y-%m-%d %H:%M:%S'),
-                            'text': message.text,
-                            'id': message.id
-                        })
+                messages = await self.client.get_messages(entity, limit=50, min_id=min_id)
+                matched_messages = self._filter_messages(messages, filter_config)
                 
                 print(f"   ✅ Found {len(matched_messages)} filtered messages")
             
             # Send email if messages found
             if matched_messages:
                 self._print_search_summary(matched_messages)
-                
-                template = config.get('template', 'breach')
-                email_subject = f"[Napas Osint] {config.get('email_subject', channel_name)}"
-                
-                html_content = EmailTemplate.create_batch_email(
-                    channel_name, 
-                    matched_messages,
-                    template
-                )
-                
-                print(f"   📧 Sending batch email with {len(matched_messages)} messages...")
-                EmailService.send_email(email_subject, html_content)
+                await self._send_batch_emails(config, channel_name, matched_messages)
+                matched_messages.clear()
             
             # Update state with latest message ID
             latest_messages = await self.client.get_messages(entity, limit=1)
@@ -155,7 +150,9 @@ class ChannelSearcher:
                 print(f"   📍 Latest message ID: {latest_messages[0].id}")
             
             # Mark as initialized
-            self.state['initialized_channels'].append(channel_id)
+            self.state['initialized_channels'].add(channel_id)
+            if self.mark_dirty_callback:
+                self.mark_dirty_callback()
             
             print(f"   ✅ Initial search completed")
             return channel_id
@@ -166,6 +163,91 @@ class ChannelSearcher:
             traceback.print_exc()
             return None
     
+    async def _catch_up(self, entity, config, channel_id, event_id):
+        """
+        Fetch messages posted since the last seen ID (e.g. while disconnected)
+        
+        Args:
+            entity: Resolved channel entity
+            config: Channel configuration dict
+            channel_id: Positive channel ID
+            event_id: Channel ID with -100 prefix
+        """
+        last_id = self.state['last_message_ids'].get(channel_id)
+        if last_id is None:
+            return
+        
+        channel_name = config.get('name', config.get('username'))
+        filter_config = config.get('filter')
+        
+        # limit=None pages back all the way to the last seen ID
+        messages = await self.client.get_messages(entity, min_id=last_id, limit=None)
+        if not messages:
+            print(f"   ✅ No new messages since ID {last_id}")
+            return
+        
+        matched_messages = self._filter_messages(messages, filter_config)
+        
+        if matched_messages:
+            await self._send_batch_emails(config, channel_name, matched_messages)
+        
+        newest_id = max(message.id for message in messages)
+        self.state['last_message_ids'][channel_id] = newest_id
+        self.state['last_message_ids'][event_id] = newest_id
+        if self.mark_dirty_callback:
+            self.mark_dirty_callback()
+        print(f"   📍 Latest message ID: {newest_id}")
+    
+    @staticmethod
+    def _filter_messages(messages, filter_config):
+        """
+        Filter fetched messages in one batch
+        
+        Args:
+            messages: List of Telethon messages
+            filter_config: Filter dict with 'type' and 'value'
+        
+        Returns:
+            List of message dicts (date, text, id) that passed the filter
+        """
+        with_text = [message for message in messages if message.text]
+        passed = BotFilter.apply_filter_batch([message.text for message in with_text], filter_config)
+        return [
+            {
+                'date': message.date.isoformat(' ', 'seconds')[:19],
+                'text': message.text,
+                'id': message.id
+            }
+            for message in compress(with_text, passed)
+        ]
+    
+    async def _send_batch_emails(self, config, channel_name, matched_messages):
+        """
+        Email matched messages as batch reports of at most EMAIL_BATCH_SIZE each
+        
+        Args:
+            config: Channel configuration dict
+            channel_name: Display name of the channel
+            matched_messages: List of message dicts, newest first
+        """
+        template = config.get('template', 'breach')
+        email_subject = f"[Napas Osint] {config.get('email_subject', channel_name)}"
+        total_parts = (len(matched_messages) + EMAIL_BATCH_SIZE - 1) // EMAIL_BATCH_SIZE
+        
+        for part, start in enumerate(range(0, len(matched_messages), EMAIL_BATCH_SIZE), 1):
+            batch = matched_messages[start:start + EMAIL_BATCH_SIZE]
+            subject = email_subject
+            if total_parts > 1:
+                subject = f"{email_subject} ({part}/{total_parts})"
+            
+            # Large reports take a while to render, keep the event loop free
+            html_content = await asyncio.to_thread(
+                EmailTemplate.create_batch_email, channel_name, batch, template
+            )
+            
+            print(f"   📧 Sending batch email with {len(batch)} messages...")
+            await asyncio.to_thread(EmailService.send_email, subject, html_content)
+    
     def _print_search_summary(self, matched_messages):
         """Print summary of search results"""
         print(f"\n   📊 SEARCH RESULTS SUMMARY:")
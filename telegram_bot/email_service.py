@@ -3,8 +3,14 @@ Email Service Module
 Handles all email sending functionality
 """
 import os
+import ssl
+import time
+import atexit
+import threading
+import base64
 import smtplib
-from email.mime.text import MIMEText
+import functools
+from email.header import Header
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from dotenv import load_dotenv
@@ -18,11 +24,116 @@ EMAIL_TO = os.getenv('EMAIL_TO')
 HC_EMAIL_TO = os.getenv('HC_EMAIL_TO')
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
 SMTP_PORT = int(os.getenv('SMTP_PORT', '465'))
+SMTP_MAX_ATTEMPTS = int(os.getenv('SMTP_MAX_ATTEMPTS', '3'))
+
+# Recipient lists (parsed once)
+EMAIL_TO_LIST = [email.strip() for email in EMAIL_TO.split(',') if email.strip()] if EMAIL_TO else []
+HC_EMAIL_TO_LIST = [email.strip() for email in HC_EMAIL_TO.split(',') if email.strip()] if HC_EMAIL_TO else []
+
+# Shared TLS context (CA bundle is loaded once per process)
+_SSL_CTX = ssl.create_default_context()
+
+# Invariant message headers, serialized once
+_HEADER_PREFIX = (
+    f"From: {EMAIL_FROM or ''}\r\n"
+    "MIME-Version: 1.0\r\n"
+    "Content-Type: text/html; charset=\"utf-8\"\r\n"
+    "Content-Transfer-Encoding: base64\r\n"
+).encode()
+
+
+def _encode_header(name, value):
+    """Encode a header value (RFC 2047 when not plain ASCII), folded with CRLF"""
+    if value.isascii() and len(name) + len(value) + 2 <= 78:
+        return value
+    charset = 'us-ascii' if value.isascii() else 'utf-8'
+    return Header(value, charset, header_name=name).encode(linesep='\r\n')
+
+
+def _build_message(subject, html_content, to_emails):
+    """Build the wire bytes of an HTML email"""
+    body = base64.encodebytes(html_content.encode('utf-8')).replace(b'\n', b'\r\n')
+    headers = (
+        f"Subject: {_encode_header('Subject', subject)}\r\n"
+        f"To: {_encode_header('To', ', '.join(to_emails))}\r\n\r\n"
+    )
+    return _HEADER_PREFIX + headers.encode() + body
+
+
+@functools.lru_cache(maxsize=4)
+def _fmt_ts(sec):
+    """Format a whole-second epoch timestamp (cached per second)"""
+    return datetime.fromtimestamp(sec).isoformat(' ')
+
+
+# Health check email body, rendered with str.format_map (CSS braces are doubled)
+_HEALTH_CHECK_TEMPLATE = """
+<html>
+<head>
+    <style>
+        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
+        .container {{ max-width: 600px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
+        .header {{ background: {status_color}; color: white; padding: 30px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; color: white; }}
+        .content {{ padding: 35px; }}
+        .status-badge {{ display: inline-block; background: {status_color}; color: white; padding: 8px 16px; border-radius: 20px; font-size: 14px; font-weight: 600; margin-bottom: 20px; }}
+        .info-box {{ background: #f8f9fa; padding: 15px; border-left: 4px solid {status_color}; border-radius: 4px; margin-top: 20px; }}
+        .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{status_icon} Telegram Monitor Health Check</h1>
+        </div>
+        <div class="content">
+            <span class="status-badge">{status_text}</span>
+            <h3>Status Report</h3>
+            <div class="info-box">
+                <strong>Message:</strong><br>
+                {message}
+            </div>
+            <div class="info-box">
+                <strong>Timestamp:</strong><br>
+                {timestamp}
+            </div>
+        </div>
+        <div class="footer">
+            <div>Napas OSINT Monitor</div>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+def _render_health_check(status, message, timestamp):
+    """Render the health check email body"""
+    return _HEALTH_CHECK_TEMPLATE.format_map({
+        'status_color': "#28a745" if status == "success" else "#dc3545",
+        'status_icon': "✅" if status == "success" else "❌",
+        'status_text': "Connected" if status == "success" else "Connection Failed",
+        'message': message,
+        'timestamp': timestamp,
+    })
+
+
+# Health check bodies for the common empty-message case, split around the timestamp
+_TS_SLOT = '\x00timestamp\x00'
+_HC_EMPTY = {
+    status: tuple(_render_health_check(status, "", _TS_SLOT).split(_TS_SLOT))
+    for status in ('success', 'failed')
+}
 
 
 class EmailService:
     """Service for sending emails"""
     
+    # SMTP connection reused across sends (see _get_connection);
+    # sends may run in worker threads, so access is serialized
+    _smtp = None
+    _lock = threading.Lock()
+    
     @staticmethod
     def send_email(subject, html_content, to_emails=None):
         """
@@ -44,24 +155,84 @@ class EmailService:
             if not EMAIL_TO:
                 print("[!] Missing EMAIL_TO in environment")
                 return False
-            to_emails = [email.strip() for email in EMAIL_TO.split(',')]
+            to_emails = EMAIL_TO_LIST
         
-        try:
-            msg = MIMEText(html_content, "html", "utf-8")
-            msg["Subject"] = subject
-            msg["From"] = EMAIL_FROM
-            msg["To"] = ", ".join(to_emails)
-            
-            print(f"[DEBUG] Connecting to {SMTP_SERVER}:{SMTP_PORT}...")
-            with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
-                server.login(EMAIL_FROM, EMAIL_PASSWORD)
-                server.sendmail(EMAIL_FROM, to_emails, msg.as_string())
-            
-            print(f"      ✅ Email sent to {', '.join(to_emails)}")
-            return True
-        except Exception as e:
-            print(f"      ❌ Email error: {e}")
+        if not to_emails:
+            print("[!] No recipients; skipping")
             return False
+        
+        msg = _build_message(subject, html_content, to_emails)
+        return EmailService.send_raw(msg, tuple(to_emails))
+    
+    @staticmethod
+    def send_raw(msg, to_emails):
+        """
+        Send an already-serialized email
+        
+        Args:
+            msg: Wire bytes of the message (headers and body)
+            to_emails: Tuple of recipient emails
+        
+        Returns:
+            bool: True if sent successfully, False otherwise
+        """
+        with EmailService._lock:
+            for attempt in range(1, SMTP_MAX_ATTEMPTS + 1):
+                try:
+                    server = EmailService._get_connection()
+                    server.sendmail(EMAIL_FROM, to_emails, msg)
+                    
+                    print(f"      ✅ Email sent to {', '.join(to_emails)}")
+                    return True
+                except smtplib.SMTPServerDisconnected as e:
+                    EmailService.close()
+                    if attempt == SMTP_MAX_ATTEMPTS:
+                        print(f"      ❌ Email error: {e}")
+                        return False
+                    delay = 2 ** (attempt - 1)
+                    print(f"      ⚠️  SMTP disconnected ({e}), retrying in {delay}s...")
+                    time.sleep(delay)
+                except (smtplib.SMTPException, OSError) as e:
+                    EmailService.close()
+                    print(f"      ❌ Email error: {e}")
+                    return False
+    
+    @staticmethod
+    def _get_connection():
+        """
+        Return the cached SMTP connection, reconnecting if it went stale
+        
+        Returns:
+            Logged-in smtplib.SMTP_SSL instance
+        """
+        server = EmailService._smtp
+        if server is not None:
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            EmailService.close()
+        
+        print(f"[DEBUG] Connecting to {SMTP_SERVER}:{SMTP_PORT}...")
+        server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, context=_SSL_CTX)
+        try:
+            server.login(EMAIL_FROM, EMAIL_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        EmailService._smtp = server
+        return server
+    
+    @staticmethod
+    def close():
+        """Close the cached SMTP connection, if any"""
+        server, EmailService._smtp = EmailService._smtp, None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
     
     @staticmethod
     def send_health_check_email(status="success", message=""):
@@ -76,50 +247,17 @@ class EmailService:
             return
         
         try:
-            status_color = "#28a745" if status == "success" else "#dc3545"
-            status_icon = "✅" if status == "success" else "❌"
             status_text = "Connected" if status == "success" else "Connection Failed"
             
-            html_content = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
-                    .container {{ max-width: 600px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
-                    .header {{ background: {status_color}; color: white; padding: 30px; text-align: center; }}
-                    .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; color: white; }}
-                    .content {{ padding: 35px; }}
-                    .status-badge {{ display: inline-block; background: {status_color}; color: white; padding: 8px 16px; border-radius: 20px; font-size: 14px; font-weight: 600; margin-bottom: 20px; }}
-                    .info-box {{ background: #f8f9fa; padding: 15px; border-left: 4px solid {status_color}; border-radius: 4px; margin-top: 20px; }}
-                    .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>{status_icon} Telegram Monitor Health Check</h1>
-                    </div>
-                    <div class="content">
-                        <span class="status-badge">{status_text}</span>
-                        <h3>Status Report</h3>
-                        <div class="info-box">
-                            <strong>Message:</strong><br>
-                            {message}
-                        </div>
-                        <div class="info-box">
-                            <strong>Timestamp:</strong><br>
-                            {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                        </div>
-                    </div>
-                    <div class="footer">
-                        <div>Napas OSINT Monitor</div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            timestamp = _fmt_ts(int(time.time()))
+            
+            if not message:
+                head, tail = _HC_EMPTY['success' if status == "success" else 'failed']
+                html_content = head + timestamp + tail
+            else:
+                html_content = _render_health_check(status, message, timestamp)
             
-            to_emails = [email.strip() for email in HC_EMAIL_TO.split(',')]
+            to_emails = HC_EMAIL_TO_LIST
             EmailService.send_email(
                 f"[Health Check] Telegram Monitor - {status_text}",
                 html_content,
@@ -127,5 +265,8 @@ class EmailService:
             )
             
             print(f"   📧 Health check email sent")
-        except Exception as e:
-            print(f"   ⚠️  Could not send health check email: {e}")
\ No newline at end of file
+        except (smtplib.SMTPException, OSError) as e:
+            print(f"   ⚠️  Could not send health check email: {e}")
+
+
+atexit.register(EmailService.close)
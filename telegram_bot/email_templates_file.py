@@ -1,44 +1,638 @@
 import re
+import html
 import json
+import functools
 from datetime import datetime
 
+try:
+    # Optional linear-time engine (pip install google-re2)
+    import re2 as _field_re
+except ImportError:
+    _field_re = re
+
+try:
+    # Optional multi-keyword matcher (pip install pyahocorasick)
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    # Optional fast JSON decoder (pip install orjson)
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+
+# Precompiled patterns for parse_message_data
+_FIELDS_RE = _field_re.compile(
+    r'"(Source|source|Title|title|Content|content|Detection Date|detection_date)"\s*:\s*"([^"]*)"'
+)
+_FIELD_KEYS = {
+    'Source': 'source', 'source': 'source',
+    'Title': 'title', 'title': 'title',
+    'Content': 'content', 'content': 'content',
+    'Detection Date': 'detection_date', 'detection_date': 'detection_date',
+}
+_JSON_DECODER = json.JSONDecoder()
+_VISIT_RE = re.compile(r'Visit the link.*?\.\.\.', re.IGNORECASE | re.DOTALL)
+
+_ATTACHMENT_ICONS = {
+    'Photo': '🖼️',
+    'Document': '📄',
+    'Video': '🎥',
+    'Audio': '🎵',
+    'Voice': '🎤',
+    'Sticker': '😀',
+    'Poll': '📊',
+    'Contact': '👤',
+    'Location': '📍'
+}
+
+# HTML-escape text (as html.escape) and turn newlines into <br> in a single pass
+_HTML_TRANS = str.maketrans({
+    '\n': '<br>\n', '<': '&lt;', '>': '&gt;', '&': '&amp;', '"': '&quot;', "'": '&#x27;'
+})
+
+
+def _format_text(text):
+    """HTML-escape message text for embedding in an email body"""
+    return text.translate(_HTML_TRANS)
+
+
+@functools.lru_cache(maxsize=256)
+def _channel_html(channel_name):
+    """HTML-escaped channel name (names come from config, so escape each once)"""
+    return html.escape(str(channel_name))
+
+
+def _field_html(value):
+    """HTML-escape a parsed field value, 'N/A' when empty"""
+    return html.escape(str(value)) if value else 'N/A'
+
+
+def _message_html(message):
+    """Escaped text of a message, computed once and cached on the message dict"""
+    formatted = message.get('_html')
+    if formatted is None:
+        formatted = message['_html'] = _format_text(message['text'])
+    return formatted
+
+
+def _strip_visit_link(content):
+    """Remove every 'Visit the link ... ...' sentence (same result as _VISIT_RE.sub)"""
+    lowered = content.lower()
+    if len(lowered) != len(content):
+        # Lowercasing changed offsets (rare non-ASCII case), use the regex
+        return _VISIT_RE.sub('', content)
+    
+    start = lowered.find('visit the link')
+    if start < 0:
+        return content
+    
+    parts = []
+    pos = 0
+    while start >= 0:
+        end = content.find('...', start + 14)
+        if end < 0:
+            break
+        parts.append(content[pos:start])
+        pos = end + 3
+        start = lowered.find('visit the link', pos)
+    parts.append(content[pos:])
+    return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=2048)
+def _parse_by_id(msg_id, text):
+    """Memoized EmailTemplate.parse_message_data (text is part of the key since ids are per channel)"""
+    return EmailTemplate.parse_message_data(text)
+
+
+def _json_fields(data):
+    """Extract (source, content, detection_date, title) from a parsed JSON dict"""
+    return (
+        data.get('Source', data.get('source', '')),
+        data.get('Content', data.get('content', '')),
+        data.get('Detection Date', data.get('detection_date', '')),
+        data.get('Title', data.get('title', '')),
+    )
+
 
 class BotFilter:
     """Filter class for messages"""
     
     @staticmethod
-    def apply_filter(message_text, filter_config):
-        """Apply filter based on configuration"""
-        if not filter_config:
-            return True
+    def compile(filter_config):
+        """
+        Build a predicate for a filter configuration
         
-        filter_type = filter_config.get('type', 'contains')
-        filter_value = filter_config.get('value', '')
+        Args:
+            filter_config: Filter dict with 'type' and 'value'
         
+        Returns:
+            Function taking message text and returning True if it passes
+        """
+        filter_value = filter_config.get('value', '')
         if not filter_value:
+            return _accept_all
+        
+        build = _FILTER_BUILDERS.get(filter_config.get('type', 'contains'))
+        if build is None:
+            return _accept_all
+        return build(filter_value)
+    
+    @staticmethod
+    def apply_filter(message_text, filter_config):
+        """Apply filter based on configuration (compiled once per config)"""
+        if not filter_config:
             return True
         
-        # Support multiple keywords (list or comma-separated string)
-        keywords = []
-        if isinstance(filter_value, list):
-            keywords = filter_value
-        elif isinstance(filter_value, str):
-            keywords = [k.strip() for k in filter_value.split(',')]
+        match = filter_config.get('_compiled')
+        if match is None:
+            match = filter_config['_compiled'] = BotFilter.compile(filter_config)
+        return match(message_text)
+    
+    @staticmethod
+    def apply_filter_batch(message_texts, filter_config):
+        """
+        Apply a filter to many messages at once
+        
+        Args:
+            message_texts: List of message texts
+            filter_config: Filter dict with 'type' and 'value'
         
-        if filter_type == 'contains':
-            return any(keyword.lower() in message_text.lower() for keyword in keywords)
-        elif filter_type == 'contains_all':
-            return all(keyword.lower() in message_text.lower() for keyword in keywords)
-        elif filter_type == 'starts_with':
-            return any(message_text.lower().startswith(keyword.lower()) for keyword in keywords)
-        elif filter_type == 'ends_with':
-            return any(message_text.lower().endswith(keyword.lower()) for keyword in keywords)
-        elif filter_type == 'regex':
-            return bool(re.search(filter_value, message_text, re.IGNORECASE))
-        elif filter_type == 'not_contains':
-            return not any(keyword.lower() in message_text.lower() for keyword in keywords)
+        Returns:
+            List of bools, one per message
+        """
+        if not filter_config:
+            return [True] * len(message_texts)
         
-        return True
+        match = filter_config.get('_compiled')
+        if match is None:
+            match = filter_config['_compiled'] = BotFilter.compile(filter_config)
+        return list(map(match, message_texts))
+
+
+def _accept_all(message_text):
+    """Predicate for an empty or unknown filter"""
+    return True
+
+
+def _filter_keywords(filter_value):
+    """Lowercased keywords of a filter value (list or comma-separated string)"""
+    if isinstance(filter_value, list):
+        return tuple(k.lower() for k in filter_value)
+    if isinstance(filter_value, str):
+        return tuple(k.strip().lower() for k in filter_value.split(','))
+    return ()
+
+
+def _any_keywords(keywords):
+    """
+    Drop keywords that cannot change an "any keyword occurs" test
+    
+    A keyword containing a shorter keyword only matches where the shorter
+    one already does, so scanning for it is wasted work.
+    """
+    kept = []
+    for keyword in sorted(set(keywords), key=len):
+        if not any(shorter in keyword for shorter in kept):
+            kept.append(keyword)
+    return tuple(kept)
+
+
+def _all_keywords(keywords):
+    """
+    Drop keywords that cannot change an "every keyword occurs" test
+    
+    A keyword contained in a longer keyword is implied by it.
+    """
+    kept = []
+    for keyword in sorted(set(keywords), key=len, reverse=True):
+        if not any(keyword in longer for longer in kept):
+            kept.append(keyword)
+    return tuple(kept)
+
+
+# Below this many keywords, repeated substring scans beat an automaton
+_AUTOMATON_MIN_KEYWORDS = 48
+
+
+def _keyword_automaton(keywords):
+    """Aho-Corasick automaton over keywords, or None when not worthwhile"""
+    if ahocorasick is None or len(keywords) < _AUTOMATON_MIN_KEYWORDS or '' in keywords:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+def _regex_filter(filter_value):
+    """Case-insensitive regex search"""
+    search = re.compile(filter_value, re.IGNORECASE).search
+    return lambda message_text: search(message_text) is not None
+
+
+def _contains_filter(filter_value):
+    """Any keyword occurs in the text"""
+    keywords = _any_keywords(_filter_keywords(filter_value))
+    automaton = _keyword_automaton(keywords)
+    if automaton is not None:
+        return lambda message_text: next(automaton.iter(message_text.lower()), None) is not None
+    def match(message_text):
+        lower_text = message_text.lower()
+        return any(keyword in lower_text for keyword in keywords)
+    return match
+
+
+def _contains_all_filter(filter_value):
+    """Every keyword occurs in the text"""
+    keywords = _all_keywords(_filter_keywords(filter_value))
+    automaton = _keyword_automaton(keywords)
+    if automaton is not None:
+        def match(message_text):
+            hits = {keyword for _, keyword in automaton.iter(message_text.lower())}
+            return len(hits) == len(keywords)
+        return match
+    def match(message_text):
+        lower_text = message_text.lower()
+        return all(keyword in lower_text for keyword in keywords)
+    return match
+
+
+def _starts_with_filter(filter_value):
+    """Text starts with any keyword"""
+    keywords = _filter_keywords(filter_value)
+    # Lowercase only the head that can match (lower() never shortens text)
+    width = max(map(len, keywords), default=0)
+    return lambda message_text: message_text[:width].lower().startswith(keywords)
+
+
+def _ends_with_filter(filter_value):
+    """Text ends with any keyword"""
+    keywords = _filter_keywords(filter_value)
+    width = max(map(len, keywords), default=0)
+    return lambda message_text: message_text[-width:].lower().endswith(keywords)
+
+
+def _not_contains_filter(filter_value):
+    """No keyword occurs in the text"""
+    keywords = _any_keywords(_filter_keywords(filter_value))
+    automaton = _keyword_automaton(keywords)
+    if automaton is not None:
+        return lambda message_text: next(automaton.iter(message_text.lower()), None) is None
+    def match(message_text):
+        lower_text = message_text.lower()
+        return not any(keyword in lower_text for keyword in keywords)
+    return match
+
+
+# Filter type -> function building a predicate from the filter value
+_FILTER_BUILDERS = {
+    'regex': _regex_filter,
+    'contains': _contains_filter,
+    'contains_all': _contains_all_filter,
+    'starts_with': _starts_with_filter,
+    'ends_with': _ends_with_filter,
+    'not_contains': _not_contains_filter,
+}
+
+
+# HTML templates, rendered with str.format_map (CSS braces are doubled)
+_MINIMAL_TEMPLATE = """
+<html>
+<body style="font-family: Arial, sans-serif; padding: 20px;">
+    <h3>🔔 New Message: {channel_name}</h3>
+    <p><small>{date}</small></p>
+    <div style="background: #f5f5f5; padding: 15px; border-left: 3px solid #333;">
+        {formatted_text}
+    </div>
+    {attachments_html}
+</body>
+</html>
+"""
+
+_BREACH_TEMPLATE = """
+<html>
+<head>
+    <style>
+        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
+        .container {{ max-width: 650px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%); color: white; padding: 30px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; }}
+        .header p {{ margin: 5px 0 0 0; opacity: 0.9; font-size: 14px; }}
+        .content {{ padding: 35px; }}
+        .field {{ margin-bottom: 25px; }}
+        .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 8px; }}
+        .field-value {{ font-size: 15px; color: #333; line-height: 1.6; padding: 12px; background: #f8f9fa; border-left: 3px solid #2a5298; border-radius: 4px; }}
+        .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
+        .timestamp {{ color: #999; font-size: 11px; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🔒 Data Breach Alert</h1>
+            <p>{channel_name}</p>
+        </div>
+        <div class="content">
+            <div class="field">
+                <div class="field-label">Source</div>
+                <div class="field-value">{source}</div>
+            </div>
+            <div class="field">
+                <div class="field-label">Content Description</div>
+                <div class="field-value">{content}</div>
+            </div>
+            <div class="field">
+                <div class="field-label">Detection Date</div>
+                <div class="field-value">{detection_date}</div>
+            </div>
+            {attachments_html}
+        </div>
+        <div class="footer">
+            <div class="timestamp">Report generated: {date}</div>
+            <div style="margin-top: 8px;">Message ID: {id}</div>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+_CVE_TEMPLATE = """
+<html>
+<head>
+    <style>
+        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
+        .container {{ max-width: 700px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #c62828 0%, #e53935 100%); color: white; padding: 30px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; }}
+        .header p {{ margin: 5px 0 0 0; opacity: 0.9; font-size: 14px; }}
+        .content {{ padding: 35px; }}
+        .title-section {{ background: #fff3e0; border-left: 4px solid #e53935; padding: 20px; margin-bottom: 30px; border-radius: 4px; }}
+        .title-label {{ font-size: 11px; text-transform: uppercase; color: #c62828; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 10px; }}
+        .title-value {{ font-size: 18px; color: #333; font-weight: 600; line-height: 1.4; }}
+        .field {{ margin-bottom: 25px; }}
+        .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 8px; }}
+        .field-value {{ font-size: 14px; color: #333; line-height: 1.8; padding: 15px; background: #f8f9fa; border-left: 3px solid #e53935; border-radius: 4px; }}
+        .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
+        .timestamp {{ color: #999; font-size: 11px; }}
+        .cve-badge {{ display: inline-block; background: #c62828; color: white; padding: 4px 12px; border-radius: 12px; font-size: 11px; font-weight: 600; margin-bottom: 10px; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>⚠️ CVE Security Alert</h1>
+            <p>{channel_name}</p>
+        </div>
+        <div class="content">
+            <div class="title-section">
+                <span class="cve-badge">VULNERABILITY ALERT</span>
+                <div class="title-label">Vulnerability Title</div>
+                <div class="title-value">{title}</div>
+            </div>
+            <div class="field">
+                <div class="field-label">Details & Description</div>
+                <div class="field-value">{formatted_content}</div>
+            </div>
+            {attachments_html}
+        </div>
+        <div class="footer">
+            <div class="timestamp">Report generated: {date}</div>
+            <div style="margin-top: 8px;">Message ID: {id}</div>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+_RAW_TEMPLATE = """
+<html>
+<body style="font-family: 'Courier New', monospace; margin: 0; padding: 40px; background: white; color: #000;">
+    <div style="border-bottom: 1px solid #000; padding-bottom: 10px; margin-bottom: 20px;">
+        <strong>🔔 NEW: {channel_name}</strong><br>
+        <small>{date}</small>
+    </div>
+    <div style="line-height: 1.6;">
+        {formatted_text}
+    </div>
+    {attachments_html}
+</body>
+</html>
+"""
+
+_MINIMAL_BATCH_HEADER = """
+<html>
+<body style="font-family: Arial, sans-serif; padding: 20px;">
+    <h2>📊 {results_title}: {channel_name}</h2>
+    <p><strong>Found {count} messages</strong></p>
+    <p><small>Report generated: {timestamp}</small></p>
+    <hr>
+"""
+
+_MINIMAL_BATCH_ITEM = """
+<div style="background: #f9f9f9; padding: 15px; margin: 15px 0; border-left: 3px solid #333;">
+    <strong>#{idx}</strong> - <small>{date}</small><br><br>
+    {formatted_text}
+    {attachments_html}
+</div>
+"""
+
+_MINIMAL_BATCH_FOOTER = """
+</body>
+</html>
+"""
+
+_BREACH_BATCH_HEADER = """
+<html>
+<head>
+    <style>
+        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
+        .container {{ max-width: 800px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%); color: white; padding: 35px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 28px; font-weight: 600; }}
+        .header p {{ margin: 8px 0 0 0; opacity: 0.9; font-size: 15px; }}
+        .summary {{ padding: 25px 35px; background: #e3f2fd; border-bottom: 1px solid #e0e0e0; }}
+        .summary-item {{ display: inline-block; margin-right: 30px; }}
+        .summary-label {{ font-size: 11px; text-transform: uppercase; color: #1e3c72; font-weight: 600; }}
+        .summary-value {{ font-size: 24px; color: #1e3c72; font-weight: 600; }}
+        .content {{ padding: 35px; }}
+        .alert-item {{ background: white; border: 1px solid #e0e0e0; border-radius: 6px; margin-bottom: 20px; overflow: hidden; }}
+        .alert-header {{ background: #f8f9fa; padding: 15px 20px; border-bottom: 1px solid #e0e0e0; }}
+        .alert-number {{ font-weight: 600; color: #1e3c72; }}
+        .alert-body {{ padding: 20px; }}
+        .field {{ margin-bottom: 15px; }}
+        .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 5px; }}
+        .field-value {{ font-size: 14px; color: #333; line-height: 1.5; padding: 10px; background: #f8f9fa; border-left: 3px solid #2a5298; border-radius: 3px; }}
+        .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🔒 Data Breach Report</h1>
+            <p>{channel_name}</p>
+        </div>
+        <div class="summary">
+            <div class="summary-item">
+                <div class="summary-label">Total Alerts</div>
+                <div class="summary-value">{count}</div>
+            </div>
+            <div class="summary-item">
+                <div class="summary-label">Report Date</div>
+                <div class="summary-value" style="font-size: 16px;">{report_date}</div>
+            </div>
+        </div>
+        <div class="content">
+"""
+
+_BREACH_BATCH_ITEM = """
+<div class="alert-item">
+    <div class="alert-header">
+        <span class="alert-number">Alert #{idx}</span>
+        <span style="float: right; color: #999; font-size: 12px;">ID: {id}</span>
+    </div>
+    <div class="alert-body">
+        <div class="field">
+            <div class="field-label">Source</div>
+            <div class="field-value">{source}</div>
+        </div>
+        <div class="field">
+            <div class="field-label">Content Description</div>
+            <div class="field-value">{content}</div>
+        </div>
+        <div class="field">
+            <div class="field-label">Detection Date</div>
+            <div class="field-value">{detection_date}</div>
+        </div>
+        {attachments_html}
+    </div>
+</div>
+"""
+
+_BREACH_BATCH_RAW_ITEM = """
+<div class="alert-item">
+    <div class="alert-header">
+        <span class="alert-number">Alert #{idx}</span>
+        <span style="float: right; color: #999; font-size: 12px;">ID: {id}</span>
+    </div>
+    <div class="alert-body">
+        <div class="field">
+            <div class="field-label">Raw Message Content</div>
+            <div class="field-value">{formatted_text}</div>
+        </div>
+        {attachments_html}
+    </div>
+</div>
+"""
+
+_BREACH_BATCH_FOOTER = """
+        </div>
+        <div class="footer">
+            <div>{completed_label} {timestamp}</div>
+            <div style="margin-top: 5px; color: #999;">This is an automated data breach report</div>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+_CVE_BATCH_HEADER = """
+<html>
+<head>
+    <style>
+        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
+        .container {{ max-width: 850px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #c62828 0%, #e53935 100%); color: white; padding: 35px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 28px; font-weight: 600; }}
+        .header p {{ margin: 8px 0 0 0; opacity: 0.9; font-size: 15px; }}
+        .summary {{ padding: 25px 35px; background: #fff3e0; border-bottom: 1px solid #e0e0e0; }}
+        .summary-item {{ display: inline-block; margin-right: 30px; }}
+        .summary-label {{ font-size: 11px; text-transform: uppercase; color: #c62828; font-weight: 600; }}
+        .summary-value {{ font-size: 24px; color: #c62828; font-weight: 600; }}
+        .content {{ padding: 35px; }}
+        .cve-item {{ background: white; border: 1px solid #e0e0e0; border-radius: 6px; margin-bottom: 25px; overflow: hidden; }}
+        .cve-header {{ background: #f8f9fa; padding: 15px 20px; border-bottom: 1px solid #e0e0e0; }}
+        .cve-number {{ font-weight: 600; color: #c62828; }}
+        .cve-badge {{ display: inline-block; background: #c62828; color: white; padding: 3px 10px; border-radius: 10px; font-size: 10px; font-weight: 600; margin-left: 10px; }}
+        .cve-body {{ padding: 25px; }}
+        .title-section {{ background: #fff3e0; border-left: 4px solid #e53935; padding: 15px; margin-bottom: 20px; border-radius: 4px; }}
+        .title-value {{ font-size: 16px; color: #333; font-weight: 600; line-height: 1.5; }}
+        .field {{ margin-bottom: 15px; }}
+        .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 8px; }}
+        .field-value {{ font-size: 14px; color: #333; line-height: 1.7; padding: 12px; background: #f8f9fa; border-left: 3px solid #e53935; border-radius: 3px; }}
+        .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>⚠️ CVE Security Report</h1>
+            <p>{channel_name}</p>
+        </div>
+        <div class="summary">
+            <div class="summary-item">
+                <div class="summary-label">Total Vulnerabilities</div>
+                <div class="summary-value">{count}</div>
+            </div>
+            <div class="summary-item">
+                <div class="summary-label">Report Date</div>
+                <div class="summary-value" style="font-size: 16px;">{report_date}</div>
+            </div>
+        </div>
+        <div class="content">
+"""
+
+_CVE_BATCH_ITEM = """
+<div class="cve-item">
+    <div class="cve-header">
+        <span class="cve-number">CVE #{idx}</span>
+        <span class="cve-badge">VULNERABILITY</span>
+        <span style="float: right; color: #999; font-size: 12px;">ID: {id}</span>
+    </div>
+    <div class="cve-body">
+        <div class="title-section">
+            <div class="title-value">{title}</div>
+        </div>
+        </div>
+        <div class="field">
+            <div class="field-label">Details & Description</div>
+            <div class="field-value">{formatted_content}</div>
+        </div>
+        {attachments_html}
+    </div>
+</div>
+"""
+
+_CVE_BATCH_RAW_ITEM = """
+<div class="cve-item">
+    <div class="cve-header">
+        <span class="cve-number">CVE #{idx}</span>
+        <span style="float: right; color: #999; font-size: 12px;">ID: {id}</span>
+    </div>
+    <div class="cve-body">
+        <div class="field">
+            <div class="field-label">Raw Message Content</div>
+            <div class="field-value">{formatted_text}</div>
+        </div>
+        {attachments_html}
+    </div>
+</div>
+"""
+
+_CVE_BATCH_FOOTER = """
+        </div>
+        <div class="footer">
+            <div>{completed_label} {timestamp}</div>
+            <div style="margin-top: 5px; color: #999;">This is an automated CVE vulnerability report</div>
+        </div>
+    </div>
+</body>
+</html>
+"""
 
 
 class EmailTemplate:
@@ -50,42 +644,32 @@ class EmailTemplate:
         if not attachments:
             return ""
         
-        html = """
+        parts = ["""
         <div style="margin-top: 20px; padding: 15px; background: #f0f7ff; border-left: 3px solid #2196F3; border-radius: 4px;">
             <div style="font-size: 11px; text-transform: uppercase; color: #1976D2; font-weight: 600; margin-bottom: 10px;">
                 📎 Attachments ({count})
             </div>
-        """.format(count=len(attachments))
+        """.format(count=len(attachments))]
         
         for att in attachments:
-            icon = {
-                'Photo': '🖼️',
-                'Document': '📄',
-                'Video': '🎥',
-                'Audio': '🎵',
-                'Voice': '🎤',
-                'Sticker': '😀',
-                'Poll': '📊',
-                'Contact': '👤',
-                'Location': '📍'
-            }.get(att['type'], '📎')
+            icon = _ATTACHMENT_ICONS.get(att['type'], '📎')
             
             extra_info = ""
             if 'duration' in att:
                 extra_info = f" • {att['duration']}"
             if 'mime_type' in att:
-                extra_info += f" • {att['mime_type']}"
+                extra_info += f" • {html.escape(att['mime_type'])}"
             
-            html += f"""
+            parts.append(f"""
             <div style="padding: 8px 0; border-bottom: 1px solid #e0e0e0;">
                 <span style="font-weight: 600;">{icon} {att['type']}</span><br>
-                <span style="color: #666; font-size: 13px;">{att['name']}</span><br>
+                <span style="color: #666; font-size: 13px;">{html.escape(att['name'])}</span><br>
                 <span style="color: #999; font-size: 12px;">{att['size']}{extra_info}</span>
             </div>
-            """
+            """)
         
-        html += "</div>"
-        return html
+        parts.append("</div>")
+        return ''.join(parts)
     
     @staticmethod
     def parse_message_data(text):
@@ -93,476 +677,276 @@ class EmailTemplate:
         source = content = detection_date = title = None
         parse_success = False
         
-        if '"Source":' in text or '"source":' in text.lower():
-            try:
-                # Method 1: Direct JSON parse
+        if '"Source"' in text or '"source"' in text:
+            data = None
+            
+            # Method 1: Direct JSON parse
+            if text.lstrip().startswith('{'):
                 try:
-                    data = json.loads(text)
-                    source = data.get('Source', data.get('source', ''))
-                    content = data.get('Content', data.get('content', ''))
-                    detection_date = data.get('Detection Date', data.get('detection_date', ''))
-                    title = data.get('Title', data.get('title', ''))
-                    if source or content or detection_date or title:
-                        parse_success = True
-                except:
-                    # Method 2: Extract JSON part before ** markers
-                    json_part = text
-                    if '**' in text:
-                        json_part = text.split('**')[0].strip()
-                    elif '🔹' in text:
-                        json_part = text.split('🔹')[0].strip()
-                    elif '\n\n' in text:
-                        json_part = text.split('\n\n')[0].strip()
-                    
-                    # Method 3: Use regex to extract field by field
-                    source_match = re.search(r'"Source"\s*:\s*"([^"]+)"', json_part, re.IGNORECASE)
-                    if source_match:
-                        source = source_match.group(1)
-                    
-                    title_match = re.search(r'"Title"\s*:\s*"([^"]+)"', json_part, re.IGNORECASE)
-                    if title_match:
-                        title = title_match.group(1)
-                    
-                    content_match = re.search(r'"Content"\s*:\s*"([^"]+?)"\s*,\s*"', json_part, re.IGNORECASE | re.DOTALL)
-                    if content_match:
-                        content = content_match.group(1)
-                    
-                    date_match = re.search(r'"Detection Date"\s*:\s*"([^"]+)"', json_part, re.IGNORECASE)
-                    if date_match:
-                        detection_date = date_match.group(1)
-                    
-                    if source or content or detection_date or title:
-                        parse_success = True
-            except Exception:
-                pass
+                    data = _json_loads(text)
+                except ValueError:
+                    pass
+            
+            # Method 2: Decode the first {...} object, ignoring trailing text
+            if not isinstance(data, dict):
+                data = None
+                start = text.find('{')
+                if start >= 0:
+                    try:
+                        data = _JSON_DECODER.raw_decode(text, start)[0]
+                    except ValueError:
+                        pass
+            
+            if isinstance(data, dict):
+                source, content, detection_date, title = _json_fields(data)
+            else:
+                # Method 3: Extract JSON part before ** markers
+                json_part = text
+                if '**' in text:
+                    json_part = text.split('**')[0].strip()
+                elif '🔹' in text:
+                    json_part = text.split('🔹')[0].strip()
+                elif '\n\n' in text:
+                    json_part = text.split('\n\n')[0].strip()
+                
+                # Method 4: Extract all fields with one regex pass
+                fields = {}
+                for match in _FIELDS_RE.finditer(json_part):
+                    fields.setdefault(_FIELD_KEYS[match.group(1)], match.group(2))
+                source = fields.get('source')
+                title = fields.get('title')
+                content = fields.get('content')
+                detection_date = fields.get('detection_date')
+            
+            if source or content or detection_date or title:
+                parse_success = True
         
         # Clean content: remove "Visit the link..." sentence
         if content:
-            content = re.sub(r'Visit the link.*?\.\.\.', '', content, flags=re.IGNORECASE | re.DOTALL).strip()
+            # JSON payloads may carry a number or object here
+            if not isinstance(content, str):
+                content = str(content)
+            content = _strip_visit_link(content).strip()
         
         return parse_success, source, content, detection_date, title
     
+    @staticmethod
+    def parse_for_message(message):
+        """
+        parse_message_data result for a message dict
+        
+        Cached on the dict and by message id, so the filter, single and
+        batch paths share one parse per message.
+        """
+        parsed = message.get('_parsed')
+        if parsed is None:
+            parsed = message['_parsed'] = _parse_by_id(message['id'], message['text'])
+        return parsed
+    
     @staticmethod
     def create_email(channel_name, message, template='breach'):
         """Create email for a message"""
-        if template == 'breach':
-            return EmailTemplate.breach_template(channel_name, message)
-        elif template == 'cve':
-            return EmailTemplate.cve_template(channel_name, message)
-        else:
-            return EmailTemplate.minimal_template(channel_name, message)
+        return _SINGLE_RENDERERS.get(template, EmailTemplate.minimal_template)(channel_name, message)
     
     @staticmethod
-    def create_batch_email(channel_name, messages, template='breach'):
-        """Create email for multiple messages (initial search)"""
-        if template == 'breach':
-            return EmailTemplate.breach_batch_template(channel_name, messages)
-        elif template == 'cve':
-            return EmailTemplate.cve_batch_template(channel_name, messages)
-        else:
-            return EmailTemplate.minimal_batch_template(channel_name, messages)
+    def create_batch_email(channel_name, messages, template='breach', live=False):
+        """
+        Create email for multiple messages
+        
+        Args:
+            channel_name: Display name of the channel
+            messages: List of message dicts
+            template: Template name ('breach', 'cve' or 'minimal')
+            live: Label the report as new messages instead of initial search results
+        """
+        return _BATCH_RENDERERS.get(template, _render_minimal_batch)(channel_name, messages, live)
     
     @staticmethod
     def minimal_template(channel_name, message):
         """Minimal template for single message"""
-        formatted_text = message['text'].replace('\n', '<br>')
-        attachments_html = EmailTemplate._format_attachments_html(message.get('attachments', []))
-        
-        html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; padding: 20px;">
-            <h3>🔔 New Message: {channel_name}</h3>
-            <p><small>{message['date']}</small></p>
-            <div style="background: #f5f5f5; padding: 15px; border-left: 3px solid #333;">
-                {formatted_text}
-            </div>
-            {attachments_html}
-        </body>
-        </html>
-        """
-        return html
+        return _MINIMAL_TEMPLATE.format_map({
+            'channel_name': _channel_html(channel_name),
+            'date': message['date'],
+            'formatted_text': _message_html(message),
+            'attachments_html': EmailTemplate._format_attachments_html(message.get('attachments', [])),
+        })
        
     @staticmethod
     def breach_template(channel_name, message):
         """Breach detector template for single message"""
-        parse_success, source, content, detection_date, title = EmailTemplate.parse_message_data(message['text'])
+        parse_success, source, content, detection_date, title = EmailTemplate.parse_for_message(message)
         attachments_html = EmailTemplate._format_attachments_html(message.get('attachments', []))
         
         if parse_success and (source or content or detection_date):
-            html = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
-                    .container {{ max-width: 650px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
-                    .header {{ background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%); color: white; padding: 30px; text-align: center; }}
-                    .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; }}
-                    .header p {{ margin: 5px 0 0 0; opacity: 0.9; font-size: 14px; }}
-                    .content {{ padding: 35px; }}
-                    .field {{ margin-bottom: 25px; }}
-                    .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 8px; }}
-                    .field-value {{ font-size: 15px; color: #333; line-height: 1.6; padding: 12px; background: #f8f9fa; border-left: 3px solid #2a5298; border-radius: 4px; }}
-                    .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
-                    .timestamp {{ color: #999; font-size: 11px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🔒 Data Breach Alert</h1>
-                        <p>{channel_name}</p>
-                    </div>
-                    <div class="content">
-                        <div class="field">
-                            <div class="field-label">Source</div>
-                            <div class="field-value">{source if source else 'N/A'}</div>
-                        </div>
-                        <div class="field">
-                            <div class="field-label">Content Description</div>
-                            <div class="field-value">{content if content else 'N/A'}</div>
-                        </div>
-                        <div class="field">
-                            <div class="field-label">Detection Date</div>
-                            <div class="field-value">{detection_date if detection_date else 'N/A'}</div>
-                        </div>
-                        {attachments_html}
-                    </div>
-                    <div class="footer">
-                        <div class="timestamp">Report generated: {message['date']}</div>
-                        <div style="margin-top: 8px;">Message ID: {message['id']}</div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-        else:
-            formatted_text = message['text'].replace('\n', '<br>')
-            html = f"""
-            <html>
-            <body style="font-family: 'Courier New', monospace; margin: 0; padding: 40px; background: white; color: #000;">
-                <div style="border-bottom: 1px solid #000; padding-bottom: 10px; margin-bottom: 20px;">
-                    <strong>🔔 NEW: {channel_name}</strong><br>
-                    <small>{message['date']}</small>
-                </div>
-                <div style="line-height: 1.6;">
-                    {formatted_text}
-                </div>
-                {attachments_html}
-            </body>
-            </html>
-            """
-        return html
+            return _BREACH_TEMPLATE.format_map({
+                'channel_name': _channel_html(channel_name),
+                'source': _field_html(source),
+                'content': _field_html(content),
+                'detection_date': _field_html(detection_date),
+                'attachments_html': attachments_html,
+                'date': message['date'],
+                'id': message['id'],
+            })
+        
+        return _RAW_TEMPLATE.format_map({
+            'channel_name': _channel_html(channel_name),
+            'date': message['date'],
+            'formatted_text': _message_html(message),
+            'attachments_html': attachments_html,
+        })
     
     @staticmethod
     def cve_template(channel_name, message):
         """CVE detector template for single message"""
-        parse_success, source, content, detection_date, title = EmailTemplate.parse_message_data(message['text'])
+        parse_success, source, content, detection_date, title = EmailTemplate.parse_for_message(message)
         attachments_html = EmailTemplate._format_attachments_html(message.get('attachments', []))
         
         if parse_success and (title or content):
-            formatted_content = content.replace('\n', '<br>') if content else 'N/A'
-            
-            html = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
-                    .container {{ max-width: 700px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
-                    .header {{ background: linear-gradient(135deg, #c62828 0%, #e53935 100%); color: white; padding: 30px; text-align: center; }}
-                    .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; }}
-                    .header p {{ margin: 5px 0 0 0; opacity: 0.9; font-size: 14px; }}
-                    .content {{ padding: 35px; }}
-                    .title-section {{ background: #fff3e0; border-left: 4px solid #e53935; padding: 20px; margin-bottom: 30px; border-radius: 4px; }}
-                    .title-label {{ font-size: 11px; text-transform: uppercase; color: #c62828; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 10px; }}
-                    .title-value {{ font-size: 18px; color: #333; font-weight: 600; line-height: 1.4; }}
-                    .field {{ margin-bottom: 25px; }}
-                    .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 8px; }}
-                    .field-value {{ font-size: 14px; color: #333; line-height: 1.8; padding: 15px; background: #f8f9fa; border-left: 3px solid #e53935; border-radius: 4px; }}
-                    .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
-                    .timestamp {{ color: #999; font-size: 11px; }}
-                    .cve-badge {{ display: inline-block; background: #c62828; color: white; padding: 4px 12px; border-radius: 12px; font-size: 11px; font-weight: 600; margin-bottom: 10px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>⚠️ CVE Security Alert</h1>
-                        <p>{channel_name}</p>
-                    </div>
-                    <div class="content">
-                        <div class="title-section">
-                            <span class="cve-badge">VULNERABILITY ALERT</span>
-                            <div class="title-label">Vulnerability Title</div>
-                            <div class="title-value">{title if title else 'N/A'}</div>
-                        </div>
-                        <div class="field">
-                            <div class="field-label">Details & Description</div>
-                            <div class="field-value">{formatted_content}</div>
-                        </div>
-                        {attachments_html}
-                    </div>
-                    <div class="footer">
-                        <div class="timestamp">Report generated: {message['date']}</div>
-                        <div style="margin-top: 8px;">Message ID: {message['id']}</div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-        else:
-            formatted_text = message['text'].replace('\n', '<br>')
-            html = f"""
-            <html>
-            <body style="font-family: 'Courier New', monospace; margin: 0; padding: 40px; background: white; color: #000;">
-                <div style="border-bottom: 1px solid #000; padding-bottom: 10px; margin-bottom: 20px;">
-                    <strong>🔔 NEW: {channel_name}</strong><br>
-                    <small>{message['date']}</small>
-                </div>
-                <div style="line-height: 1.6;">
-                    {formatted_text}
-                </div>
-                {attachments_html}
-            </body>
-            </html>
-            """
-        return html
+            return _CVE_TEMPLATE.format_map({
+                'channel_name': _channel_html(channel_name),
+                'title': _field_html(title),
+                'formatted_content': _format_text(content) if content else 'N/A',
+                'attachments_html': attachments_html,
+                'date': message['date'],
+                'id': message['id'],
+            })
+        
+        return _RAW_TEMPLATE.format_map({
+            'channel_name': _channel_html(channel_name),
+            'date': message['date'],
+            'formatted_text': _message_html(message),
+            'attachments_html': attachments_html,
+        })
     
     
     @staticmethod
     def minimal_batch_template(channel_name, messages):
         """Minimal batch template"""
-        html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; padding: 20px;">
-            <h2>📊 Initial Search Results: {channel_name}</h2>
-            <p><strong>Found {len(messages)} messages</strong></p>
-            <p><small>Report generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</small></p>
-            <hr>
-        """
-        
-        for idx, msg in enumerate(messages, 1):
-            formatted_text = msg['text'].replace('\n', '<br>')
-            attachments_html = EmailTemplate._format_attachments_html(msg.get('attachments', []))
-            
-            html += f"""
-            <div style="background: #f9f9f9; padding: 15px; margin: 15px 0; border-left: 3px solid #333;">
-                <strong>#{idx}</strong> - <small>{msg['date']}</small><br><br>
-                {formatted_text}
-                {attachments_html}
-            </div>
-            """
-        
-        html += """
-        </body>
-        </html>
-        """
-        return html  
+        return _render_minimal_batch(channel_name, messages)
 
     @staticmethod
     def breach_batch_template(channel_name, messages):
         """Breach detector batch template"""
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
-                .container {{ max-width: 800px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
-                .header {{ background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%); color: white; padding: 35px; text-align: center; }}
-                .header h1 {{ margin: 0; font-size: 28px; font-weight: 600; }}
-                .header p {{ margin: 8px 0 0 0; opacity: 0.9; font-size: 15px; }}
-                .summary {{ padding: 25px 35px; background: #e3f2fd; border-bottom: 1px solid #e0e0e0; }}
-                .summary-item {{ display: inline-block; margin-right: 30px; }}
-                .summary-label {{ font-size: 11px; text-transform: uppercase; color: #1e3c72; font-weight: 600; }}
-                .summary-value {{ font-size: 24px; color: #1e3c72; font-weight: 600; }}
-                .content {{ padding: 35px; }}
-                .alert-item {{ background: white; border: 1px solid #e0e0e0; border-radius: 6px; margin-bottom: 20px; overflow: hidden; }}
-                .alert-header {{ background: #f8f9fa; padding: 15px 20px; border-bottom: 1px solid #e0e0e0; }}
-                .alert-number {{ font-weight: 600; color: #1e3c72; }}
-                .alert-body {{ padding: 20px; }}
-                .field {{ margin-bottom: 15px; }}
-                .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 5px; }}
-                .field-value {{ font-size: 14px; color: #333; line-height: 1.5; padding: 10px; background: #f8f9fa; border-left: 3px solid #2a5298; border-radius: 3px; }}
-                .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🔒 Data Breach Report</h1>
-                    <p>{channel_name}</p>
-                </div>
-                <div class="summary">
-                    <div class="summary-item">
-                        <div class="summary-label">Total Alerts</div>
-                        <div class="summary-value">{len(messages)}</div>
-                    </div>
-                    <div class="summary-item">
-                        <div class="summary-label">Report Date</div>
-                        <div class="summary-value" style="font-size: 16px;">{datetime.now().strftime('%Y-%m-%d %H:%M')}</div>
-                    </div>
-                </div>
-                <div class="content">
-        """
-        
-        for idx, msg in enumerate(messages, 1):
-            parse_success, source, content, detection_date, title = EmailTemplate.parse_message_data(msg['text'])
-            attachments_html = EmailTemplate._format_attachments_html(msg.get('attachments', []))
-            
-            if not parse_success or not (source or content or detection_date):
-                formatted_text = msg['text'].replace('\n', '<br>')
-                html += f"""
-                    <div class="alert-item">
-                        <div class="alert-header">
-                            <span class="alert-number">Alert #{idx}</span>
-                            <span style="float: right; color: #999; font-size: 12px;">ID: {msg['id']}</span>
-                        </div>
-                        <div class="alert-body">
-                            <div class="field">
-                                <div class="field-label">Raw Message Content</div>
-                                <div class="field-value">{formatted_text}</div>
-                            </div>
-                            {attachments_html}
-                        </div>
-                    </div>
-                """
-            else:
-                html += f"""
-                    <div class="alert-item">
-                        <div class="alert-header">
-                            <span class="alert-number">Alert #{idx}</span>
-                            <span style="float: right; color: #999; font-size: 12px;">ID: {msg['id']}</span>
-                        </div>
-                        <div class="alert-body">
-                            <div class="field">
-                                <div class="field-label">Source</div>
-                                <div class="field-value">{source if source else 'N/A'}</div>
-                            </div>
-                            <div class="field">
-                                <div class="field-label">Content Description</div>
-                                <div class="field-value">{content if content else 'N/A'}</div>
-                            </div>
-                            <div class="field">
-                                <div class="field-label">Detection Date</div>
-                                <div class="field-value">{detection_date if detection_date else 'N/A'}</div>
-                            </div>
-                            {attachments_html}
-                        </div>
-                    </div>
-                """
-        
-        html += f"""
-                </div>
-                <div class="footer">
-                    <div>Initial search completed on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
-                    <div style="margin-top: 5px; color: #999;">This is an automated data breach report</div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        return html
+        return _render_breach_batch(channel_name, messages)
 
     @staticmethod
     def cve_batch_template(channel_name, messages):
         """CVE detector batch template"""
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
-                .container {{ max-width: 850px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
-                .header {{ background: linear-gradient(135deg, #c62828 0%, #e53935 100%); color: white; padding: 35px; text-align: center; }}
-                .header h1 {{ margin: 0; font-size: 28px; font-weight: 600; }}
-                .header p {{ margin: 8px 0 0 0; opacity: 0.9; font-size: 15px; }}
-                .summary {{ padding: 25px 35px; background: #fff3e0; border-bottom: 1px solid #e0e0e0; }}
-                .summary-item {{ display: inline-block; margin-right: 30px; }}
-                .summary-label {{ font-size: 11px; text-transform: uppercase; color: #c62828; font-weight: 600; }}
-                .summary-value {{ font-size: 24px; color: #c62828; font-weight: 600; }}
-                .content {{ padding: 35px; }}
-                .cve-item {{ background: white; border: 1px solid #e0e0e0; border-radius: 6px; margin-bottom: 25px; overflow: hidden; }}
-                .cve-header {{ background: #f8f9fa; padding: 15px 20px; border-bottom: 1px solid #e0e0e0; }}
-                .cve-number {{ font-weight: 600; color: #c62828; }}
-                .cve-badge {{ display: inline-block; background: #c62828; color: white; padding: 3px 10px; border-radius: 10px; font-size: 10px; font-weight: 600; margin-left: 10px; }}
-                .cve-body {{ padding: 25px; }}
-                .title-section {{ background: #fff3e0; border-left: 4px solid #e53935; padding: 15px; margin-bottom: 20px; border-radius: 4px; }}
-                .title-value {{ font-size: 16px; color: #333; font-weight: 600; line-height: 1.5; }}
-                .field {{ margin-bottom: 15px; }}
-                .field-label {{ font-size: 11px; text-transform: uppercase; color: #666; font-weight: 600; letter-spacing: 0.5px; margin-bottom: 8px; }}
-                .field-value {{ font-size: 14px; color: #333; line-height: 1.7; padding: 12px; background: #f8f9fa; border-left: 3px solid #e53935; border-radius: 3px; }}
-                .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>⚠️ CVE Security Report</h1>
-                    <p>{channel_name}</p>
-                </div>
-                <div class="summary">
-                    <div class="summary-item">
-                        <div class="summary-label">Total Vulnerabilities</div>
-                        <div class="summary-value">{len(messages)}</div>
-                    </div>
-                    <div class="summary-item">
-                        <div class="summary-label">Report Date</div>
-                        <div class="summary-value" style="font-size: 16px;">{datetime.now().strftime('%Y-%m-%d %H:%M')}</div>
-                    </div>
-                </div>
-                <div class="content">
-        """
+        return _render_cve_batch(channel_name, messages)
+
+
+def _minimal_batch_row(idx, msg):
+    """Render one message of the minimal batch template"""
+    return _MINIMAL_BATCH_ITEM.format_map({
+        'idx': idx,
+        'date': msg['date'],
+        'formatted_text': _message_html(msg),
+        'attachments_html': EmailTemplate._format_attachments_html(msg.get('attachments', [])),
+    })
+
+
+def _breach_batch_row(idx, msg):
+    """Render one message of the breach batch template"""
+    parse_success, source, content, detection_date, title = EmailTemplate.parse_for_message(msg)
+    attachments_html = EmailTemplate._format_attachments_html(msg.get('attachments', []))
+    
+    if not parse_success or not (source or content or detection_date):
+        return _BREACH_BATCH_RAW_ITEM.format_map({
+            'idx': idx,
+            'id': msg['id'],
+            'formatted_text': _message_html(msg),
+            'attachments_html': attachments_html,
+        })
+    
+    return _BREACH_BATCH_ITEM.format_map({
+        'idx': idx,
+        'id': msg['id'],
+        'source': _field_html(source),
+        'content': _field_html(content),
+        'detection_date': _field_html(detection_date),
+        'attachments_html': attachments_html,
+    })
+
+
+def _cve_batch_row(idx, msg):
+    """Render one message of the CVE batch template"""
+    parse_success, source, content, detection_date, title = EmailTemplate.parse_for_message(msg)
+    attachments_html = EmailTemplate._format_attachments_html(msg.get('attachments', []))
+    
+    if not parse_success or not (title or content):
+        return _CVE_BATCH_RAW_ITEM.format_map({
+            'idx': idx,
+            'id': msg['id'],
+            'formatted_text': _message_html(msg),
+            'attachments_html': attachments_html,
+        })
+    
+    return _CVE_BATCH_ITEM.format_map({
+        'idx': idx,
+        'id': msg['id'],
+        'title': _field_html(title),
+        'formatted_content': _format_text(content) if content else 'N/A',
+        'attachments_html': attachments_html,
+    })
+
+
+# Batch report wording for initial search (False) and live/new messages (True)
+_BATCH_LABELS = {
+    False: {'results_title': 'Initial Search Results', 'completed_label': 'Initial search completed on'},
+    True: {'results_title': 'New Messages', 'completed_label': 'New messages reported on'},
+}
+
+
+def _make_batch_renderer(header, render_row, footer):
+    """
+    Build a renderer for a header / per-message row / footer batch template
+    
+    Args:
+        header: Header template (channel_name, count, report_date, timestamp,
+                results_title, completed_label)
+        render_row: Function (idx, msg) -> HTML for one message
+        footer: Footer template (same placeholders as header)
+    
+    Returns:
+        Function (channel_name, messages, live=False) -> HTML
+    """
+    render_header = header.format_map
+    render_footer = footer.format_map
+    
+    def render(channel_name, messages, live=False):
+        timestamp = datetime.now().isoformat(' ', 'seconds')
+        context = {
+            'channel_name': _channel_html(channel_name),
+            'count': len(messages),
+            'report_date': timestamp[:16],
+            'timestamp': timestamp,
+            **_BATCH_LABELS[live],
+        }
         
+        parts = [render_header(context)]
+        append = parts.append
         for idx, msg in enumerate(messages, 1):
-            parse_success, source, content, detection_date, title = EmailTemplate.parse_message_data(msg['text'])
-            attachments_html = EmailTemplate._format_attachments_html(msg.get('attachments', []))
-            
-            if not parse_success or not (title or content):
-                formatted_text = msg['text'].replace('\n', '<br>')
-                html += f"""
-                    <div class="cve-item">
-                        <div class="cve-header">
-                            <span class="cve-number">CVE #{idx}</span>
-                            <span style="float: right; color: #999; font-size: 12px;">ID: {msg['id']}</span>
-                        </div>
-                        <div class="cve-body">
-                            <div class="field">
-                                <div class="field-label">Raw Message Content</div>
-                                <div class="field-value">{formatted_text}</div>
-                            </div>
-                            {attachments_html}
-                        </div>
-                    </div>
-                """
-            else:
-                formatted_content = content.replace('\n', '<br>') if content else 'N/A'
-                html += f"""
-                    <div class="cve-item">
-                        <div class="cve-header">
-                            <span class="cve-number">CVE #{idx}</span>
-                            <span class="cve-badge">VULNERABILITY</span>
-                            <span style="float: right; color: #999; font-size: 12px;">ID: {msg['id']}</span>
-                        </div>
-                        <div class="cve-body">
-                            <div class="title-section">
-                                <div class="title-value">{title if title else 'N/A'}</div>
-                            </div>
-                            </div>
-                            <div class="field">
-                                <div class="field-label">Details & Description</div>
-                                <div class="field-value">{formatted_content}</div>
-                            </div>
-                            {attachments_html}
-                        </div>
-                    </div>
-                """
-        
-        html += f"""
-                </div>
-                <div class="footer">
-                    <div>Initial search completed on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
-                    <div style="margin-top: 5px; color: #999;">This is an automated CVE vulnerability report</div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        return html
\ No newline at end of file
+            append(render_row(idx, msg))
+        append(render_footer(context))
+        return ''.join(parts)
+    
+    return render
+
+
+_render_minimal_batch = _make_batch_renderer(_MINIMAL_BATCH_HEADER, _minimal_batch_row, _MINIMAL_BATCH_FOOTER)
+_render_breach_batch = _make_batch_renderer(_BREACH_BATCH_HEADER, _breach_batch_row, _BREACH_BATCH_FOOTER)
+_render_cve_batch = _make_batch_renderer(_CVE_BATCH_HEADER, _cve_batch_row, _CVE_BATCH_FOOTER)
+
+
+# Template name -> renderer (unknown names fall back to minimal)
+_SINGLE_RENDERERS = {
+    'breach': EmailTemplate.breach_template,
+    'cve': EmailTemplate.cve_template,
+    'minimal': EmailTemplate.minimal_template,
+}
+
+_BATCH_RENDERERS = {
+    'breach': _render_breach_batch,
+    'cve': _render_cve_batch,
+    'minimal': _render_minimal_batch,
+}
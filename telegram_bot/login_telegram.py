@@ -1,15 +1,19 @@
 import os
 import asyncio
-from telethon import TelegramClient
-from dotenv import load_dotenv
-
-load_dotenv()
-
-API_ID = os.getenv('TELEGRAM_API_ID')
-API_HASH = os.getenv('TELEGRAM_API_HASH')
 
 async def login():
     """Login to Telegram and save session"""
+    # Deferred so importing this module stays cheap
+    from telethon import TelegramClient
+    from dotenv import load_dotenv
+    
+    # Skip reading .env when docker/systemd already provide the credentials
+    if not (os.getenv('TELEGRAM_API_ID') and os.getenv('TELEGRAM_API_HASH')):
+        load_dotenv(override=False)
+    
+    API_ID = os.getenv('TELEGRAM_API_ID')
+    API_HASH = os.getenv('TELEGRAM_API_HASH')
+    
     print("="*60)
     print("🔐 Telegram Login Setup")
     print("="*60)
@@ -45,6 +49,13 @@ async def login():
     await client.disconnect()
 
 if __name__ == '__main__':
+    try:
+        # Optional libuv-based event loop (pip install uvloop, not on Windows)
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     try:
         asyncio.run(login())
     except KeyboardInterrupt:
@@ -3,10 +3,15 @@ Main Monitor Script
 Orchestrates the search and listening workflow
 """
 import os
-import json
+import re
+import time
 import asyncio
+import tempfile
+import random
 import pickle
+import orjson
 from telethon import TelegramClient
+from telethon.tl.functions import PingRequest
 from telethon.errors import (
     FloodWaitError, 
     ServerError, 
@@ -16,6 +21,7 @@ from dotenv import load_dotenv
 
 # Import custom modules
 from email_service import EmailService
+from email_templates_file import BotFilter
 from channel_search import ChannelSearcher
 from realtime_listener import RealtimeListener
 
@@ -30,23 +36,46 @@ MAX_RETRIES = int(os.getenv('MAX_RETRIES', '5'))
 RETRY_DELAY = int(os.getenv('RETRY_DELAY', '10'))
 RECONNECT_DELAY = int(os.getenv('RECONNECT_DELAY', '30'))
 PING_INTERVAL = int(os.getenv('PING_INTERVAL', '60'))
+SEARCH_CONCURRENCY = int(os.getenv('SEARCH_CONCURRENCY', '8'))
+STATE_SAVE_INTERVAL = int(os.getenv('STATE_SAVE_INTERVAL', '5'))
 
 # Files
-STATE_FILE = 'sessions/monitor_state.pkl'
+STATE_FILE = 'sessions/monitor_state.json'
+LEGACY_STATE_FILE = 'sessions/monitor_state.pkl'
 SESSION_FILE = 'sessions/monitor_session.session'
+CHANNELS_FILE = 'channels.json'
+
+# Parsed channels.json, reused until the file's mtime changes
+_channels_cache = {'mtime': None, 'data': None}
 
 
 def load_channels_config():
-    """Load channels configuration from channels.json"""
+    """Load channels configuration from channels.json (filters precompiled, cached by mtime)"""
     try:
-        with open('channels.json', 'r') as f:
-            return json.load(f)
+        mtime = os.stat(CHANNELS_FILE).st_mtime_ns
+        if mtime == _channels_cache['mtime']:
+            return _channels_cache['data']
+        with open(CHANNELS_FILE, 'rb') as f:
+            channels = orjson.loads(f.read())
     except FileNotFoundError:
         print("❌ Error: channels.json not found!")
         return []
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"❌ Error parsing channels.json: {e}")
         return []
+    
+    # Build filter predicates (lowercased keywords, compiled regex) up front
+    for config in channels:
+        filter_config = config.get('filter')
+        if filter_config:
+            try:
+                filter_config['_compiled'] = BotFilter.compile(filter_config)
+            except re.error as e:
+                print(f"❌ Invalid regex filter for {config.get('name', config.get('username'))}: {e}")
+    
+    _channels_cache['mtime'] = mtime
+    _channels_cache['data'] = channels
+    return channels
 
 
 def check_session_exists():
@@ -85,50 +114,187 @@ class TelegramMonitor:
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 10
         self.ping_task = None
+        self._connect_lock = asyncio.Lock()
+        self._entity_cache = {}
+        self.last_activity = time.monotonic()
+        self._dirty = False
+        self._last_saved = None
+        self._last_save_time = 0.0
+        self._save_task = None
+        # Held across serialize + write so saves never overlap
+        self._save_lock = asyncio.Lock()
         
         # Initialize modules
         self.searcher = None
         self.listener = None
+        
+        # Any incoming update proves the connection is alive
+        self.client.add_event_handler(self._touch_activity)
     
     def _load_state(self):
-        """Load state from file"""
+        """Load state from file (falling back to / migrating the legacy pickle)"""
+        failed = False
         if os.path.exists(STATE_FILE):
             try:
                 with open(STATE_FILE, 'rb') as f:
-                    return pickle.load(f)
-            except:
-                pass
+                    return self._normalize_state(orjson.loads(f.read()))
+            except (orjson.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+                self._backup_corrupt_state(STATE_FILE, e)
+                failed = True
+            except OSError as e:
+                print(f"⚠️  Could not read state file: {e}")
+        if os.path.exists(LEGACY_STATE_FILE):
+            try:
+                with open(LEGACY_STATE_FILE, 'rb') as f:
+                    return self._normalize_state(pickle.load(f))
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError) as e:
+                self._backup_corrupt_state(LEGACY_STATE_FILE, e)
+                failed = True
+            except OSError as e:
+                print(f"⚠️  Could not read state file: {e}")
+        if failed:
+            print(f"   All channels will be searched again from scratch")
         return {
-            'initialized_channels': [],
+            'initialized_channels': set(),
             'last_message_ids': {}
         }
     
-    def save_state(self):
-        """Save state to file"""
+    @staticmethod
+    def _backup_corrupt_state(path, error):
+        """Move an unreadable state file aside so the failure is visible once"""
+        print(f"⚠️  State reload failed: {error}; backing up {path} to {path}.bak")
         try:
-            os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-            with open(STATE_FILE, 'wb') as f:
-                pickle.dump(self.state, f)
-        except Exception as e:
-            print(f"⚠️  Error saving state: {e}")
+            os.replace(path, path + '.bak')
+        except OSError as e:
+            print(f"⚠️  Could not back up state file: {e}")
+    
+    @staticmethod
+    def _normalize_state(data):
+        """Restore state types (JSON object keys are strings)"""
+        return {
+            'initialized_channels': set(data.get('initialized_channels', [])),
+            'last_message_ids': {
+                int(channel_id): message_id
+                for channel_id, message_id in data.get('last_message_ids', {}).items()
+            }
+        }
+    
+    def _mark_dirty(self):
+        """Flag state as modified since the last save"""
+        self._dirty = True
+    
+    async def save_state(self, force=False):
+        """
+        Save state to file (no-op when nothing changed)
+        
+        Saves are debounced to one per STATE_SAVE_INTERVAL seconds; a save
+        requested sooner is deferred. The file write runs in a worker thread.
+        
+        Args:
+            force: Write immediately, ignoring the debounce interval
+                   (waits for a save already in progress)
+        """
+        if not self._dirty and not force:
+            return
+        
+        if not force:
+            wait = self._last_save_time + STATE_SAVE_INTERVAL - time.monotonic()
+            if wait > 0:
+                if self._save_task is None or self._save_task.done():
+                    self._save_task = asyncio.create_task(self._save_state_later(wait))
+                return
+        
+        async with self._save_lock:
+            if not self._dirty:
+                return
+            try:
+                # Serialize on the event loop so no mutation slips in between
+                # (default=sorted writes the initialized_channels set as a stable list)
+                data = orjson.dumps(self.state, default=sorted, option=orjson.OPT_NON_STR_KEYS)
+                self._dirty = False
+                self._last_save_time = time.monotonic()
+                if data != self._last_saved:
+                    await asyncio.to_thread(self._write_state, data)
+                    self._last_saved = data
+            except Exception as e:
+                self._dirty = True
+                print(f"⚠️  Error saving state: {e}")
+    
+    async def _save_state_later(self, delay):
+        """Run a deferred save once the debounce interval has passed"""
+        await asyncio.sleep(delay)
+        await self.save_state(force=True)
+    
+    @staticmethod
+    def _write_state(data):
+        """Atomically replace the state file with serialized state"""
+        state_dir = os.path.dirname(STATE_FILE)
+        os.makedirs(state_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=state_dir, prefix='.monitor_state.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, STATE_FILE)
+        except BaseException:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
+            raise
+    
+    async def resolve_entity(self, username):
+        """
+        Resolve a channel username to an entity, once per process
+        
+        Args:
+            username: Channel username without '@'
+        
+        Returns:
+            Telethon entity (raises ValueError if it cannot be resolved)
+        """
+        entity = self._entity_cache.get(username)
+        if entity is None:
+            entity = await self.client.get_entity(username)
+            self._entity_cache[username] = entity
+        return entity
+    
+    async def _touch_activity(self, event=None):
+        """Record that traffic was just seen on the connection"""
+        self.last_activity = time.monotonic()
     
     async def keep_alive_ping(self):
-        """Send periodic pings to keep connection alive"""
+        """Ping only when the connection has been idle for PING_INTERVAL"""
         while self.is_connected:
             try:
-                await asyncio.sleep(PING_INTERVAL)
+                idle = time.monotonic() - self.last_activity
+                if idle < PING_INTERVAL:
+                    await asyncio.sleep(max(1, PING_INTERVAL - idle))
+                    continue
                 if self.is_connected:
-                    await self.client.get_me()
+                    await self.client(PingRequest(ping_id=random.getrandbits(63)))
+                    self.last_activity = time.monotonic()
                     print(f"   💓 Keep-alive ping sent")
             except Exception as e:
                 print(f"   ⚠️  Keep-alive ping failed: {e}")
                 break
     
     async def connect_with_retry(self):
-        """Connect to Telegram with retry logic"""
-        for attempt in range(1, self.max_reconnect_attempts + 1):
+        """
+        Connect to Telegram with retry logic
+        
+        Transient network errors are retried indefinitely with capped
+        exponential backoff and jitter; unexpected errors give up after
+        max_reconnect_attempts.
+        """
+        attempt = 0
+        failures = 0
+        while True:
+            attempt += 1
+            self.reconnect_attempts = attempt
             try:
-                print(f"🔌 Connection attempt {attempt}/{self.max_reconnect_attempts}...")
+                print(f"🔌 Connection attempt {attempt}...")
                 
                 if not self.client.is_connected():
                     await self.client.connect()
@@ -139,6 +305,7 @@ class TelegramMonitor:
                     return False
                 
                 me = await self.client.get_me()
+                self.last_activity = time.monotonic()
                 
                 if me is None:
                     raise Exception("Failed to get user info")
@@ -154,42 +321,54 @@ class TelegramMonitor:
                 self.ping_task = asyncio.create_task(self.keep_alive_ping())
                 
                 # Send health check email
-                EmailService.send_health_check_email(
+                await asyncio.to_thread(
+                    EmailService.send_health_check_email,
                     status="success", 
                     message=f"Successfully connected as {me.first_name} (Attempt {attempt})"
                 )
                 
                 return True
                 
+            except FloodWaitError as e:
+                print(f"   ⏸️  Flood wait: {e.seconds}s, waiting...")
+                await asyncio.sleep(e.seconds)
+                continue
             except (TimedOutError, ServerError, OSError) as e:
                 print(f"   ⚠️  Connection error on attempt {attempt}: {e}")
             except Exception as e:
                 print(f"   ❌ Unexpected error on attempt {attempt}: {e}")
                 import traceback
                 traceback.print_exc()
+                failures += 1
+                if failures >= self.max_reconnect_attempts:
+                    break
             
-            if attempt < self.max_reconnect_attempts:
-                delay = RECONNECT_DELAY * attempt
-                print(f"   ⏳ Waiting {delay}s before retry...")
-                await asyncio.sleep(delay)
+            delay = min(3600, RECONNECT_DELAY * (2 ** min(attempt - 1, 10))) * random.uniform(0.5, 1.5)
+            print(f"   ⏳ Waiting {delay:.0f}s before retry...")
+            await asyncio.sleep(delay)
         
-        # All attempts failed
-        print(f"❌ Failed to connect after {self.max_reconnect_attempts} attempts")
+        # Too many unexpected errors
+        print(f"❌ Failed to connect after {attempt} attempts")
         self.is_connected = False
         
-        EmailService.send_health_check_email(
+        await asyncio.to_thread(
+            EmailService.send_health_check_email,
             status="failed", 
-            message=f"Failed to connect after {self.max_reconnect_attempts} attempts"
+            message=f"Failed to connect after {attempt} attempts"
         )
         
         return False
     
     async def ensure_connected(self):
         """Ensure client is connected, reconnect if necessary"""
-        if not self.is_connected or not self.client.is_connected():
-            print("\n⚠️  Connection lost, attempting to reconnect...")
-            self.is_connected = False
-            return await self.connect_with_retry()
+        if self.is_connected and self.client.is_connected():
+            return True
+        # Concurrent searches share one reconnect attempt
+        async with self._connect_lock:
+            if not self.is_connected or not self.client.is_connected():
+                print("\n⚠️  Connection lost, attempting to reconnect...")
+                self.is_connected = False
+                return await self.connect_with_retry()
         return True
     
     async def initialize_channels(self):
@@ -198,15 +377,32 @@ class TelegramMonitor:
         print("🚀 INITIALIZATION PHASE")
         print("="*60)
         
-        self.searcher = ChannelSearcher(self.client, self.state)
+        self.searcher = ChannelSearcher(
+            self.client, 
+            self.state, 
+            mark_dirty_callback=self._mark_dirty,
+            resolve_entity_callback=self.resolve_entity
+        )
+        
+        semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+        
+        async def search(config):
+            async with semaphore:
+                return await self.searcher.initial_search(
+                    config, 
+                    ensure_connected_callback=self.ensure_connected
+                )
+        
+        results = await asyncio.gather(
+            *(search(config) for config in self.channels_config),
+            return_exceptions=True
+        )
         
-        for config in self.channels_config:
-            channel_id = await self.searcher.initial_search(
-                config, 
-                ensure_connected_callback=self.ensure_connected
-            )
+        for config, result in zip(self.channels_config, results):
+            if isinstance(result, Exception):
+                print(f"❌ Search failed for {config.get('name', config.get('username'))}: {result}")
         
-        self.save_state()
+        await self.save_state(force=True)
         
         print("\n" + "="*60)
         print("✅ INITIALIZATION COMPLETE")
@@ -217,7 +413,9 @@ class TelegramMonitor:
         self.listener = RealtimeListener(
             self.client, 
             self.state, 
-            self.channels_config
+            self.channels_config,
+            mark_dirty_callback=self._mark_dirty,
+            resolve_entity_callback=self.resolve_entity
         )
         
         # Setup channels
@@ -255,7 +453,7 @@ class TelegramMonitor:
                 self.is_connected = False
                 if self.ping_task:
                     self.ping_task.cancel()
-                self.save_state()
+                await self.save_state(force=True)
                 break
                 
             except Exception as e:
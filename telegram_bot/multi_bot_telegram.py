@@ -1,20 +1,26 @@
 import os
-import json
+import time
+import signal
 import asyncio
-import smtplib
+import random
+import operator
 import pickle
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+import tempfile
+import orjson
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable
 from telethon import TelegramClient, events
+from telethon.tl.functions import PingRequest
 from telethon.errors import (
     FloodWaitError, 
     ServerError, 
     TimedOutError
 )
 from dotenv import load_dotenv
-import re
 from email_templates_file import EmailTemplate, BotFilter
+from email_service import EmailService, HC_EMAIL_TO_LIST
 
 load_dotenv()
 
@@ -26,33 +32,133 @@ API_HASH = os.getenv('TELEGRAM_API_HASH')
 EMAIL_FROM = os.getenv('EMAIL_FROM')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 EMAIL_TO = os.getenv('EMAIL_TO')
-HC_EMAIL_TO = os.getenv('HC_EMAIL_TO')
-SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-SMTP_PORT = int(os.getenv('SMTP_PORT', '465'))
 
 # Connection settings (read from env or use defaults)
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '5'))
 RETRY_DELAY = int(os.getenv('RETRY_DELAY', '10'))
 RECONNECT_DELAY = int(os.getenv('RECONNECT_DELAY', '30'))
 PING_INTERVAL = int(os.getenv('PING_INTERVAL', '60'))
+# Channels are searched concurrently; keyword searches across all channels
+# share one cap to stay under MTProto limits
+SEARCH_CONCURRENCY = int(os.getenv('SEARCH_CONCURRENCY', '4'))
+KEYWORD_SEARCH_CONCURRENCY = int(os.getenv('KEYWORD_SEARCH_CONCURRENCY', '4'))
+# Log every filtered-out message (noisy on busy channels)
+VERBOSE = os.getenv('VERBOSE', '0') == '1'
+STATE_SAVE_INTERVAL = int(os.getenv('STATE_SAVE_INTERVAL', '5'))
+# Matched messages per catch-up email
+EMAIL_BATCH_SIZE = 200
+
+# Health check email body, rendered with str.format_map (CSS braces are doubled)
+HEALTH_CHECK_TEMPLATE = """
+<html>
+<head>
+    <style>
+        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
+        .container {{ max-width: 600px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
+        .header {{ background: {status_color}; color: white; padding: 30px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; color: white; }}
+        .content {{ padding: 35px; }}
+        .status-badge {{ display: inline-block; background: {status_color}; color: white; padding: 8px 16px; border-radius: 20px; font-size: 14px; font-weight: 600; margin-bottom: 20px; }}
+        .info-box {{ background: #f8f9fa; padding: 15px; border-left: 4px solid {status_color}; border-radius: 4px; margin-top: 20px; }}
+        .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{status_icon} Telegram Monitor Health Check</h1>
+        </div>
+        <div class="content">
+            <span class="status-badge">{status_text}</span>
+            <h3>Status Report</h3>
+            <div class="info-box">
+                <strong>Message:</strong><br>
+                {message}
+            </div>
+            <div class="info-box">
+                <strong>Timestamp:</strong><br>
+                {timestamp}
+            </div>
+        </div>
+        <div class="footer">
+            <div>Napas OSINT Monitor</div>
+        </div>
+    </div>
+</body>
+</html>
+"""
 
 # Load channels configuration from JSON file
 def load_channels_config():
     """Load channels configuration from channels.json"""
     try:
-        with open('channels.json', 'r') as f:
-            return json.load(f)
+        with open('channels.json', 'rb') as f:
+            return orjson.loads(f.read())
     except FileNotFoundError:
         print("❌ Error: channels.json not found!")
         return []
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"❌ Error parsing channels.json: {e}")
         return []
 
 CHANNELS_CONFIG = load_channels_config()
 
+
+@dataclass(frozen=True)
+class CompiledChannel:
+    """Channel configuration prepared once at startup"""
+    username: str
+    channel_name: str
+    search_keywords: tuple
+    filter_predicate: Callable[[str], bool]
+    template: str
+    email_subject: str
+    search_limit: int
+
+
+def compile_channel_config(config):
+    """
+    Prepare a channels.json entry for the search and listen paths
+    
+    Args:
+        config: Channel configuration dict
+    
+    Returns:
+        CompiledChannel with parsed search keywords and a filter predicate
+    """
+    channel_username = config.get('username')
+    channel_name = config.get('name', channel_username)
+    filter_config = config.get('filter')
+    
+    search_keywords = ()
+    if filter_config and filter_config.get('type') in ['contains', 'contains_all']:
+        filter_value = filter_config.get('value')
+        if isinstance(filter_value, list):
+            search_keywords = tuple(filter_value)
+        elif isinstance(filter_value, str):
+            search_keywords = tuple(k.strip() for k in filter_value.split(','))
+    
+    if filter_config:
+        filter_predicate = BotFilter.compile(filter_config)
+    else:
+        filter_predicate = lambda message_text: True
+    
+    return CompiledChannel(
+        username=channel_username,
+        channel_name=channel_name,
+        search_keywords=search_keywords,
+        filter_predicate=filter_predicate,
+        template=config.get('template', 'breach'),
+        email_subject=config.get('email_subject', channel_name),
+        search_limit=config.get('search_limit', 1000),
+    )
+
+
+COMPILED_CHANNELS = [compile_channel_config(config) for config in CHANNELS_CONFIG]
+
 # State file
-STATE_FILE = 'sessions/monitor_state.pkl'
+STATE_FILE = 'sessions/monitor_state.json'
+LEGACY_STATE_FILE = 'sessions/monitor_state.pkl'
 
 # Session file check
 SESSION_FILE = 'sessions/monitor_session.session'
@@ -88,41 +194,150 @@ class SearchAndListenMonitor:
         )
         self.state = self.load_state()
         self.channels_map = {}
+        self.entities = {}
+        self.search_semaphore = asyncio.Semaphore(KEYWORD_SEARCH_CONCURRENCY)
         self.is_connected = False
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 10
         self.ping_task = None
+        self._connect_lock = asyncio.Lock()
+        self.flush_task = None
+        self.stopping = False
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        # State writes come from worker threads and shutdown paths; the lock
+        # serializes them and the sequence number drops any stale snapshot
+        self._state_lock = threading.Lock()
+        self._state_seq = 0
+        self._written_seq = 0
+        # Notification sends in flight (strong refs keep the tasks alive)
+        self._email_tasks = set()
         
     def load_state(self):
-        """Load state from file"""
-        if os.path.exists(STATE_FILE):
+        """Load state from file (falling back to / migrating the legacy pickle)"""
+        for path, decode in ((STATE_FILE, orjson.loads), (LEGACY_STATE_FILE, pickle.loads)):
+            if not os.path.exists(path):
+                continue
             try:
-                with open(STATE_FILE, 'rb') as f:
-                    return pickle.load(f)
-            except:
-                pass
+                with open(path, 'rb') as f:
+                    return self._normalize_state(decode(f.read()))
+            except OSError as e:
+                print(f"⚠️  Could not load state: {e}")
+            except Exception as e:
+                # Keep the bad file for inspection instead of overwriting it on the next flush
+                self._backup_corrupt_state(path, e)
         return {
-            'initialized_channels': [],
+            'initialized_channels': set(),
             'last_message_ids': {}
         }
     
+    @staticmethod
+    def _normalize_state(data):
+        """
+        Convert decoded state into the in-memory layout
+        
+        Args:
+            data: Decoded JSON or legacy pickle state
+        
+        Returns:
+            State dict with a set of initialized channels and int channel IDs
+        
+        Raises:
+            ValueError/TypeError: If the data does not look like saved state
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"expected an object, got {type(data).__name__}")
+        # JSON object keys are strings, channel IDs are ints
+        return {
+            'initialized_channels': set(data.get('initialized_channels', [])),
+            'last_message_ids': {
+                int(channel_id): message_id
+                for channel_id, message_id in data.get('last_message_ids', {}).items()
+            }
+        }
+    
+    @staticmethod
+    def _backup_corrupt_state(path, error):
+        """Move an unreadable state file aside so the failure is visible once"""
+        print(f"⚠️  State reload failed: {error}; backing up {path} to {path}.bak")
+        try:
+            os.replace(path, path + '.bak')
+        except OSError as e:
+            print(f"⚠️  Could not back up state file: {e}")
+    
     def save_state(self):
-        """Save state to file"""
+        """Save state to file (blocking; used on shutdown)"""
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        try:
+            self._write_state(*self._snapshot_state())
+        except Exception as e:
+            self._dirty = True
+            print(f"⚠️  Error saving state: {e}")
+    
+    async def flush_state(self):
+        """Save state to file without blocking the event loop"""
+        self._dirty = False
+        self._last_flush = time.monotonic()
         try:
-            os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-            with open(STATE_FILE, 'wb') as f:
-                pickle.dump(self.state, f)
+            # Serialize on the loop so no mutation slips in; write in a thread
+            await asyncio.to_thread(self._write_state, *self._snapshot_state())
         except Exception as e:
+            self._dirty = True
             print(f"⚠️  Error saving state: {e}")
     
+    def _snapshot_state(self):
+        """Serialize state and number the snapshot (call on the event loop)"""
+        self._state_seq += 1
+        return orjson.dumps(self.state, default=sorted, option=orjson.OPT_NON_STR_KEYS), self._state_seq
+    
+    def _write_state(self, data, seq):
+        """Atomically replace the state file with snapshot seq, unless a newer one was written"""
+        with self._state_lock:
+            if seq <= self._written_seq:
+                return
+            state_dir = os.path.dirname(STATE_FILE)
+            os.makedirs(state_dir, exist_ok=True)
+            # Write-then-rename so a crash never leaves a truncated file
+            fd, tmp_file = tempfile.mkstemp(dir=state_dir, prefix='.monitor_state.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, STATE_FILE)
+            except BaseException:
+                try:
+                    os.unlink(tmp_file)
+                except OSError:
+                    pass
+                raise
+            self._written_seq = seq
+    
+    async def flush_loop(self):
+        """Write state to disk every STATE_SAVE_INTERVAL seconds if it changed"""
+        while True:
+            await asyncio.sleep(STATE_SAVE_INTERVAL)
+            if self._dirty:
+                await self.flush_state()
+    
+    def handle_sigterm(self):
+        """Flush pending state and stop the client on SIGTERM"""
+        print("\n👋 SIGTERM received, stopping monitor...")
+        self.stopping = True
+        self.is_connected = False
+        if self._dirty:
+            self.save_state()
+        asyncio.create_task(self.client.disconnect())
+    
     async def keep_alive_ping(self):
         """Send periodic pings to keep connection alive"""
         while self.is_connected:
             try:
                 await asyncio.sleep(PING_INTERVAL)
                 if self.is_connected:
-                    # Simple operation to keep connection alive
-                    await self.client.get_me()
+                    # Bare MTProto ping, lighter than a full RPC like get_me()
+                    await self.client(PingRequest(ping_id=random.getrandbits(63)))
                     print(f"   💓 Keep-alive ping sent ({datetime.now().strftime('%H:%M:%S')})")
             except Exception as e:
                 print(f"   ⚠️  Keep-alive ping failed: {e}")
@@ -162,7 +377,8 @@ class SearchAndListenMonitor:
                 self.ping_task = asyncio.create_task(self.keep_alive_ping())
                 
                 # Send health check email
-                self.send_health_check_email(
+                await asyncio.to_thread(
+                    self.send_health_check_email,
                     status="success", 
                     message=f"Successfully connected as {me.first_name} (Attempt {attempt})"
                 )
@@ -189,7 +405,8 @@ class SearchAndListenMonitor:
         print(f"❌ Failed to connect after {self.max_reconnect_attempts} attempts")
         self.is_connected = False
         
-        self.send_health_check_email(
+        await asyncio.to_thread(
+            self.send_health_check_email,
             status="failed", 
             message=f"Failed to connect after {self.max_reconnect_attempts} attempts"
         )
@@ -198,15 +415,19 @@ class SearchAndListenMonitor:
 
     async def ensure_connected(self):
         """Ensure client is connected, reconnect if necessary"""
-        if not self.is_connected or not self.client.is_connected():
-            print("\n⚠️  Connection lost, attempting to reconnect...")
-            self.is_connected = False
-            return await self.connect_with_retry()
+        if self.is_connected and self.client.is_connected():
+            return True
+        # Concurrent searches share one reconnect attempt
+        async with self._connect_lock:
+            if not self.is_connected or not self.client.is_connected():
+                print("\n⚠️  Connection lost, attempting to reconnect...")
+                self.is_connected = False
+                return await self.connect_with_retry()
         return True
 
     def send_health_check_email(self, status="success", message=""):
         """Send health check notification email"""
-        if not EMAIL_FROM or not EMAIL_PASSWORD or not HC_EMAIL_TO:
+        if not EMAIL_FROM or not EMAIL_PASSWORD or not HC_EMAIL_TO_LIST:
             return
         
         try:
@@ -214,90 +435,39 @@ class SearchAndListenMonitor:
             status_icon = "✅" if status == "success" else "❌"
             status_text = "Connected" if status == "success" else "Connection Failed"
             
-            html_content = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 0; background-color: #f5f5f5; }}
-                    .container {{ max-width: 600px; margin: 40px auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
-                    .header {{ background: {status_color}; color: white; padding: 30px; text-align: center; }}
-                    .header h1 {{ margin: 0; font-size: 24px; font-weight: 600; color: white; }}
-                    .content {{ padding: 35px; }}
-                    .status-badge {{ display: inline-block; background: {status_color}; color: white; padding: 8px 16px; border-radius: 20px; font-size: 14px; font-weight: 600; margin-bottom: 20px; }}
-                    .info-box {{ background: #f8f9fa; padding: 15px; border-left: 4px solid {status_color}; border-radius: 4px; margin-top: 20px; }}
-                    .footer {{ padding: 20px 35px; background: #f8f9fa; border-top: 1px solid #e0e0e0; text-align: center; font-size: 12px; color: #666; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>{status_icon} Telegram Monitor Health Check</h1>
-                    </div>
-                    <div class="content">
-                        <span class="status-badge">{status_text}</span>
-                        <h3>Status Report</h3>
-                        <div class="info-box">
-                            <strong>Message:</strong><br>
-                            {message}
-                        </div>
-                        <div class="info-box">
-                            <strong>Timestamp:</strong><br>
-                            {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                        </div>
-                    </div>
-                    <div class="footer">
-                        <div>Napas OSINT Monitor</div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            to_emails = [email.strip() for email in HC_EMAIL_TO.split(',')]
-            msg = MIMEText(html_content, "html", "utf-8")
-            msg["Subject"] = f"[Health Check] Telegram Monitor - {status_text}"
-            msg["From"] = EMAIL_FROM
-            msg["To"] = ", ".join(to_emails)
+            html_content = HEALTH_CHECK_TEMPLATE.format_map({
+                'status_color': status_color,
+                'status_icon': status_icon,
+                'status_text': status_text,
+                'message': message,
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
             
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-                server.login(EMAIL_FROM, EMAIL_PASSWORD)
-                server.sendmail(EMAIL_FROM, to_emails, msg.as_string())
+            # Sent over EmailService's shared connection
+            EmailService.send_email(
+                f"[Health Check] Telegram Monitor - {status_text}",
+                html_content,
+                HC_EMAIL_TO_LIST
+            )
             
             print(f"   📧 Health check email sent")
         except Exception as e:
             print(f"   ⚠️  Could not send health check email: {e}")
 
     def send_email(self, subject, html_content):
-        """Send email"""
+        """Send email to EMAIL_TO over EmailService's shared connection"""
         if not EMAIL_FROM or not EMAIL_PASSWORD or not EMAIL_TO:
             print("[!] Missing EMAIL_FROM, EMAIL_PASSWORD or EMAIL_TO in environment")
             return False
         
-        try:
-            to_emails = [email.strip() for email in EMAIL_TO.split(',')]
-            
-            msg = MIMEText(html_content, "html", "utf-8")
-            msg["Subject"] = subject
-            msg["From"] = EMAIL_FROM
-            msg["To"] = ", ".join(to_emails)
-            
-            print("[DEBUG] Connecting to Gmail SMTP...")
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-                server.login(EMAIL_FROM, EMAIL_PASSWORD)
-                server.sendmail(EMAIL_FROM, to_emails, msg.as_string())
-            
-            print(f"      ✅ Email sent to {', '.join(to_emails)}")
-            return True
-        except Exception as e:
-            print(f"      ❌ Email error: {e}")
-            return False
+        return EmailService.send_email(subject, html_content)
     
-    async def initial_search(self, config):
+    async def initial_search(self, channel):
         """Search all history for keyword on first run"""
-        channel_username = config.get('username')
-        channel_name = config.get('name', channel_username)
-        filter_config = config.get('filter')
-        search_limit = config.get('search_limit', 1000)
+        channel_username = channel.username
+        channel_name = channel.channel_name
+        filter_predicate = channel.filter_predicate
+        search_limit = channel.search_limit
         
         print(f"\n{'='*60}")
         print(f"🔍 INITIAL SEARCH: {channel_name}")
@@ -311,65 +481,86 @@ class SearchAndListenMonitor:
             
             entity = await self.client.get_entity(channel_username)
             channel_id = entity.id
+            self.entities[channel_id] = entity
             
             if channel_id in self.state['initialized_channels']:
                 print(f"   ⏭️  Already searched, skipping initial search")
+                await self.catch_up(channel, entity, channel_id)
                 return channel_id
             
-            search_keywords = []
-            if filter_config and filter_config.get('type') in ['contains', 'contains_all']:
-                filter_value = filter_config.get('value')
-                if isinstance(filter_value, list):
-                    search_keywords = filter_value
-                elif isinstance(filter_value, str):
-                    search_keywords = [k.strip() for k in filter_value.split(',')]
+            search_keywords = channel.search_keywords
             
             matched_messages = []
-            seen_message_ids = set()
+            
+            # If only initialized_channels was lost, skip what was already seen
+            min_id = self.state['last_message_ids'].get(channel_id, 0)
             
             if search_keywords:
                 print(f"   🔎 Searching for {len(search_keywords)} keywords")
                 print(f"   ⏳ This may take a while...")
                 
-                for idx, keyword in enumerate(search_keywords, 1):
-                    print(f"      [{idx}/{len(search_keywords)}] Searching: '{keyword}'...")
-                    
-                    try:
-                        # Ensure connected before each search
-                        if not await self.ensure_connected():
-                            print(f"      ⚠️  Connection lost, skipping keyword '{keyword}'")
-                            continue
+                async def search_keyword(idx, keyword):
+                    async with self.search_semaphore:
+                        print(f"      [{idx}/{len(search_keywords)}] Searching: '{keyword}'...")
                         
-                        async for message in self.client.iter_messages(
-                            entity, 
-                            limit=search_limit,
-                            search=keyword
-                        ):
-                            if message.text and message.id not in seen_message_ids:
-                                if BotFilter.apply_filter(message.text, filter_config):
-                                    matched_messages.append({
-                                        'date': message.date.strftime('%Y-%m-%d %H:%M:%S'),
-                                        'text': message.text,
-                                        'id': message.id
-                                    })
-                                    seen_message_ids.add(message.id)
-                    except FloodWaitError as e:
-                        print(f"      ⏸️  Flood wait: {e.seconds}s, waiting...")
-                        await asyncio.sleep(e.seconds)
-                    except Exception as e:
-                        print(f"      ⚠️  Error searching '{keyword}': {e}")
-                        continue
-                
-                matched_messages.sort(key=lambda x: x['date'], reverse=True)
+                        try:
+                            # Ensure connected before each search
+                            if not await self.ensure_connected():
+                                print(f"      ⚠️  Connection lost, skipping keyword '{keyword}'")
+                                return []
+                            
+                            # Keep (date, id, text) only, so each Telethon message
+                            # (media, entities, reactions...) is freed as it streams
+                            return [
+                                (message.date, message.id, message.text)
+                                async for message in self.client.iter_messages(
+                                    entity, 
+                                    limit=search_limit,
+                                    search=keyword,
+                                    min_id=min_id
+                                )
+                                if message.message
+                            ]
+                        except FloodWaitError as e:
+                            # Sleep while holding the slot so other searches back off too
+                            print(f"      ⏸️  Flood wait: {e.seconds}s, waiting...")
+                            await asyncio.sleep(e.seconds)
+                        except Exception as e:
+                            print(f"      ⚠️  Error searching '{keyword}': {e}")
+                        return []
+                
+                results = await asyncio.gather(*(
+                    search_keyword(idx, keyword)
+                    for idx, keyword in enumerate(search_keywords, 1)
+                ))
+                
+                matched_by_id = {}
+                for hits in results:
+                    for hit in hits:
+                        if hit[1] not in matched_by_id and filter_predicate(hit[2]):
+                            matched_by_id[hit[1]] = hit
+                del results
+                
+                # Sort on the datetime, format only what goes into the email
+                matched_messages = [
+                    {
+                        'date': date.isoformat(' ', 'seconds')[:19],
+                        'text': text,
+                        'id': message_id
+                    }
+                    for date, message_id, text in sorted(
+                        matched_by_id.values(), key=operator.itemgetter(0), reverse=True
+                    )
+                ]
                 print(f"   ✅ Found {len(matched_messages)} unique messages")
             else:
                 print(f"   ℹ️  No search keyword, getting recent messages...")
-                messages = await self.client.get_messages(entity, limit=50)
+                messages = await self.client.get_messages(entity, limit=50, min_id=min_id)
                 
                 for message in messages:
-                    if message.text and BotFilter.apply_filter(message.text, filter_config):
+                    if message.message and filter_predicate(message.text):
                         matched_messages.append({
-                            'date': message.date.strftime('%Y-%m-%d %H:%M:%S'),
+                            'date': message.date.isoformat(' ', 'seconds')[:19],
                             'text': message.text,
                             'id': message.id
                         })
@@ -396,25 +587,19 @@ class SearchAndListenMonitor:
                 
                 print(f"\n   {'='*50}")
                 
-                template = config.get('template', 'breach')
-                email_subject = f"[Napas Osint] {config.get('email_subject', channel_name)}"
+                email_subject = f"[Napas Osint] {channel.email_subject}"
                 
                 html_content = EmailTemplate.create_batch_email(
                     channel_name, 
                     matched_messages,
-                    template
+                    channel.template
                 )
                 
                 print(f"   📧 Sending batch email with {len(matched_messages)} messages...")
-                self.send_email(email_subject, html_content)
+                await asyncio.to_thread(self.send_email, email_subject, html_content)
             
-            latest_messages = await self.client.get_messages(entity, limit=1)
-            if latest_messages:
-                self.state['last_message_ids'][channel_id] = latest_messages[0].id
-                print(f"   📍 Latest message ID: {latest_messages[0].id}")
-            
-            self.state['initialized_channels'].append(channel_id)
-            self.save_state()
+            # Latest message IDs are fetched in bulk by initialize_channels
+            self.state['initialized_channels'].add(channel_id)
             
             print(f"   ✅ Initial search completed")
             return channel_id
@@ -431,17 +616,127 @@ class SearchAndListenMonitor:
         print("🚀 INITIALIZATION PHASE")
         print("="*60)
         
-        for config in CHANNELS_CONFIG:
-            channel_id = await self.initial_search(config)
-            
-            if channel_id:
-                self.channels_map[channel_id] = config
+        previously_initialized = set(self.state['initialized_channels'])
+        semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+        
+        async def search(channel):
+            async with semaphore:
+                return await self.initial_search(channel)
+        
+        results = await asyncio.gather(
+            *(search(channel) for channel in COMPILED_CHANNELS),
+            return_exceptions=True
+        )
+        
+        for channel, result in zip(COMPILED_CHANNELS, results):
+            if isinstance(result, Exception):
+                print(f"❌ Search failed for {channel.channel_name}: {result}")
+            elif result:
+                self.channels_map[result] = channel
+        
+        # Channels searched in this pass need their latest ID refreshed even
+        # if an older one survived, or catch_up would re-email the search hits
+        refresh_ids = [
+            channel_id for channel_id in self.channels_map
+            if channel_id not in previously_initialized
+            or channel_id not in self.state['last_message_ids']
+        ]
+        if refresh_ids:
+            await self.fetch_latest_message_ids(refresh_ids)
+        await self.flush_state()
         
         print("\n" + "="*60)
         print("✅ INITIALIZATION COMPLETE")
         print(f"   Monitoring {len(self.channels_map)} channels")
         print("="*60)
     
+    async def catch_up(self, channel, entity, channel_id):
+        """
+        Email messages posted since the last seen ID (e.g. while stopped or disconnected)
+        
+        Args:
+            channel: CompiledChannel for the channel
+            entity: Resolved channel entity
+            channel_id: Channel ID
+        """
+        last_id = self.state['last_message_ids'].get(channel_id)
+        if last_id is None:
+            return
+        
+        # Page back all the way to last_id (newest first) so no gap is skipped;
+        # only matches are kept while streaming
+        newest_id = None
+        matched_messages = []
+        try:
+            async for message in self.client.iter_messages(entity, min_id=last_id):
+                if newest_id is None:
+                    newest_id = message.id
+                if message.message and channel.filter_predicate(message.text):
+                    matched_messages.append({
+                        'date': message.date.isoformat(' ', 'seconds')[:19],
+                        'text': message.text,
+                        'id': message.id
+                    })
+        except Exception as e:
+            print(f"   ⚠️  Could not catch up: {e}")
+            return
+        if newest_id is None:
+            print(f"   ✅ No new messages since ID {last_id}")
+            return
+        
+        email_subject = f"[New] {channel.email_subject}"
+        total_parts = (len(matched_messages) + EMAIL_BATCH_SIZE - 1) // EMAIL_BATCH_SIZE
+        for part, start in enumerate(range(0, len(matched_messages), EMAIL_BATCH_SIZE), 1):
+            batch = matched_messages[start:start + EMAIL_BATCH_SIZE]
+            subject = email_subject
+            if total_parts > 1:
+                subject = f"{email_subject} ({part}/{total_parts})"
+            
+            html_content = await asyncio.to_thread(
+                EmailTemplate.create_batch_email,
+                channel.channel_name,
+                batch,
+                channel.template,
+                live=True
+            )
+            print(f"   📧 Sending catch-up email with {len(batch)} messages...")
+            await asyncio.to_thread(self.send_email, subject, html_content)
+        
+        self.state['last_message_ids'][channel_id] = newest_id
+        self._dirty = True
+        print(f"   📍 Latest message ID: {newest_id}")
+    
+    async def fetch_latest_message_ids(self, channel_ids):
+        """
+        Record the newest message ID of each channel
+        
+        Joined channels are read from the dialog list in one paged query;
+        the rest fall back to fetching their latest message.
+        
+        Args:
+            channel_ids: Channel IDs to refresh (IDs never move backwards)
+        """
+        last_ids = self.state['last_message_ids']
+        remaining = set(channel_ids)
+        try:
+            async for dialog in self.client.iter_dialogs():
+                dialog_id = dialog.entity.id
+                if dialog_id in remaining and dialog.message:
+                    last_ids[dialog_id] = max(dialog.message.id, last_ids.get(dialog_id, 0))
+                    remaining.discard(dialog_id)
+                    if not remaining:
+                        break
+        except Exception as e:
+            print(f"   ⚠️  Could not read dialogs: {e}")
+        
+        for channel_id in remaining:
+            try:
+                latest_messages = await self.client.get_messages(self.entities[channel_id], limit=1)
+                if latest_messages:
+                    last_ids[channel_id] = max(latest_messages[0].id, last_ids.get(channel_id, 0))
+            except Exception as e:
+                print(f"   ⚠️  Could not get latest message for {channel_id}: {e}")
+    
     async def handle_new_message(self, event):
         """Handle new message event"""
         try:
@@ -451,39 +746,49 @@ class SearchAndListenMonitor:
             if channel_id not in self.channels_map:
                 return
             
-            config = self.channels_map[channel_id]
-            channel_name = config.get('name', 'Unknown')
-            filter_config = config.get('filter')
+            # Media-only posts: the raw message string is a plain attribute,
+            # while .text re-renders entities through the parse mode
+            if not message.message:
+                return
             
             if message.id <= self.state['last_message_ids'].get(channel_id, 0):
                 return
             
             self.state['last_message_ids'][channel_id] = message.id
-            self.save_state()
+            self._dirty = True
             
-            if not message.text:
-                return
+            channel = self.channels_map[channel_id]
+            channel_name = channel.channel_name or 'Unknown'
+            text = message.text
             
-            if not BotFilter.apply_filter(message.text, filter_config):
-                print(f"   ⚠️  {channel_name}: Message filtered out (ID: {message.id})")
+            if not channel.filter_predicate(text):
+                if VERBOSE:
+                    print(f"   ⚠️  {channel_name}: Message filtered out (ID: {message.id})")
                 return
             
             msg_data = {
-                'date': message.date.strftime('%Y-%m-%d %H:%M:%S'),
-                'text': message.text,
+                'date': message.date.isoformat(' ', 'seconds')[:19],
+                'text': text,
                 'id': message.id
             }
             
-            print(f"\n🔔 NEW MESSAGE: {channel_name}")
-            print(f"   ID: {message.id}")
-            print(f"   Date: {msg_data['date']}")
-            print(f"   Preview: {message.text[:100]}...")
+            # One write per message instead of one per line
+            print(
+                f"\n🔔 NEW MESSAGE: {channel_name}\n"
+                f"   ID: {message.id}\n"
+                f"   Date: {msg_data['date']}\n"
+                f"   Preview: {text[:100]}..."
+            )
             
-            email_subject = f"[New] {config.get('email_subject', channel_name)}"
-            template = config.get('template', 'breach')
+            email_subject = f"[New] {channel.email_subject}"
             
-            html_content = EmailTemplate.create_email(channel_name, msg_data, template)
-            self.send_email(email_subject, html_content)
+            html_content = EmailTemplate.create_email(channel_name, msg_data, channel.template)
+            # Don't hold up the next event while SMTP is busy
+            task = asyncio.create_task(
+                asyncio.to_thread(self.send_email, email_subject, html_content)
+            )
+            self._email_tasks.add(task)
+            task.add_done_callback(self._email_tasks.discard)
                 
         except Exception as e:
             print(f"❌ Error handling message: {e}")
@@ -492,7 +797,14 @@ class SearchAndListenMonitor:
     
     async def run_monitor(self):
         """Main monitoring process with reconnection handling"""
-        while True:
+        self.flush_task = asyncio.create_task(self.flush_loop())
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.handle_sigterm)
+        except NotImplementedError:
+            # Signal handlers are unavailable on Windows event loops
+            pass
+        
+        while not self.stopping:
             try:
                 # Connect with retry
                 connected = await self.connect_with_retry()
@@ -528,6 +840,9 @@ class SearchAndListenMonitor:
                 # Keep running until disconnected
                 await self.client.run_until_disconnected()
                 
+                if self.stopping:
+                    break
+                
             except KeyboardInterrupt:
                 print("\n👋 Stopping monitor...")
                 self.is_connected = False
@@ -547,6 +862,15 @@ class SearchAndListenMonitor:
                 
                 print(f"⏳ Reconnecting in {RECONNECT_DELAY}s...")
                 await asyncio.sleep(RECONNECT_DELAY)
+        
+        self.flush_task.cancel()
+        if self.ping_task:
+            self.ping_task.cancel()
+        if self._dirty:
+            self.save_state()
+        if self._email_tasks:
+            await asyncio.gather(*self._email_tasks, return_exceptions=True)
+        await asyncio.to_thread(EmailService.close)
 
 async def main():
     # Check if session file exists before starting
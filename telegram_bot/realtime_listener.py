@@ -2,16 +2,24 @@
 Real-time Listener Module
 Handles listening for new messages in real-time
 """
+import os
+import asyncio
 from telethon import events
 from telethon.tl.types import Channel
 from email_templates_file import EmailTemplate, BotFilter
 from email_service import EmailService
 
+# Messages arriving within this many seconds are coalesced into one email
+EMAIL_FLUSH_INTERVAL = float(os.getenv('EMAIL_FLUSH_INTERVAL', '3'))
+# Maximum messages held before a flush (also bounds one batch email)
+EMAIL_MAX_BUFFER = int(os.getenv('EMAIL_MAX_BUFFER', '50'))
+
 
 class RealtimeListener:
     """Handles real-time message listening"""
     
-    def __init__(self, client, state, channels_config):
+    def __init__(self, client, state, channels_config, mark_dirty_callback=None,
+                 resolve_entity_callback=None):
         """
         Initialize listener
         
@@ -19,10 +27,16 @@ class RealtimeListener:
             client: Telethon client instance
             state: State dictionary with last_message_ids
             channels_config: List of channel configurations
+            mark_dirty_callback: Optional function called whenever state is modified
+            resolve_entity_callback: Optional async function resolving a username
+                to an entity (default: client.get_entity)
         """
         self.client = client
         self.state = state
         self.channels_config = channels_config
+        self.mark_dirty_callback = mark_dirty_callback
+        self.resolve_entity = resolve_entity_callback or client.get_entity
+        self._outbox = None
         self.channels_map = {}
         self.channel_entities = []
         self.me = None
@@ -55,7 +69,7 @@ class RealtimeListener:
                 print(f"   Username: @{channel_username}")
                 
                 # Get entity
-                entity = await self.client.get_entity(channel_username)
+                entity = await self.resolve_entity(channel_username)
                 channel_id = entity.id
                 
                 # Calculate event ID (with -100 prefix)
@@ -292,7 +306,7 @@ class RealtimeListener:
         Start listening for new messages
         
         Args:
-            save_state_callback: Optional function to save state after processing messages
+            save_state_callback: Optional async function to save state after processing messages
         """
         print("\n" + "="*60)
         print("👂 LISTENING FOR NEW MESSAGES")
@@ -318,8 +332,80 @@ class RealtimeListener:
                 except:
                     pass
         
+        # Emails are sent by a background task that coalesces bursts
+        self._outbox = asyncio.Queue(maxsize=EMAIL_MAX_BUFFER * 20)
+        sender_task = asyncio.create_task(self._email_sender())
+        
         # Keep running
-        await self.client.run_until_disconnected()
+        try:
+            await self.client.run_until_disconnected()
+        finally:
+            # Flush whatever is still queued before handing back
+            await self._outbox.put(None)
+            await sender_task
+    
+    async def _email_sender(self):
+        """
+        Drain the outbox, grouping messages that arrive within
+        EMAIL_FLUSH_INTERVAL into one email per channel
+        
+        A None item flushes the current batch and stops the sender.
+        """
+        loop = asyncio.get_running_loop()
+        stopping = False
+        
+        while not stopping:
+            item = await self._outbox.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            deadline = loop.time() + EMAIL_FLUSH_INTERVAL
+            while len(batch) < EMAIL_MAX_BUFFER:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._outbox.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            # Group by channel, keeping arrival order
+            groups = {}
+            for config, msg_data in batch:
+                groups.setdefault(id(config), (config, []))[1].append(msg_data)
+            
+            for config, messages in groups.values():
+                try:
+                    await self._send_notification(config, messages)
+                except Exception as e:
+                    print(f"❌ Error sending notification: {e}")
+    
+    async def _send_notification(self, config, messages):
+        """
+        Email one or more new messages from a channel
+        
+        Args:
+            config: Channel configuration dict
+            messages: List of message dicts in arrival order
+        """
+        channel_name = config.get('name', 'Unknown')
+        email_subject = f"[New] {config.get('email_subject', channel_name)}"
+        template = config.get('template', 'breach')
+        
+        if len(messages) == 1:
+            html_content = EmailTemplate.create_email(channel_name, messages[0], template)
+        else:
+            print(f"   📧 Coalescing {len(messages)} messages from {channel_name} into one email")
+            html_content = await asyncio.to_thread(
+                EmailTemplate.create_batch_email, channel_name, messages[::-1], template, live=True
+            )
+        
+        await asyncio.to_thread(EmailService.send_email, email_subject, html_content)
     
     async def handle_new_message(self, event, save_state_callback=None):
         """
@@ -327,7 +413,7 @@ class RealtimeListener:
         
         Args:
             event: Telegram message event
-            save_state_callback: Optional function to save state
+            save_state_callback: Optional async function to save state
         """
         try:
             channel_id = event.chat_id
@@ -349,8 +435,10 @@ class RealtimeListener:
             
             # Update state
             self.state['last_message_ids'][channel_id] = message.id
+            if self.mark_dirty_callback:
+                self.mark_dirty_callback()
             if save_state_callback:
-                save_state_callback()
+                await save_state_callback()
             
             # Detect attachments
             attachments = self._get_message_attachments(message)
@@ -374,7 +462,7 @@ class RealtimeListener:
             is_own_message = message.sender_id == self.me.id
             
             msg_data = {
-                'date': message.date.strftime('%Y-%m-%d %H:%M:%S'),
+                'date': message.date.isoformat(' ', 'seconds')[:19],
                 'text': message.text,
                 'id': message.id,
                 'attachments': attachments
@@ -394,12 +482,8 @@ class RealtimeListener:
             print(f"   Preview: {message.text[:100]}...")
             print(f"{'='*60}")
             
-            # Send email notification
-            email_subject = f"[New] {config.get('email_subject', channel_name)}"
-            template = config.get('template', 'breach')
-            
-            html_content = EmailTemplate.create_email(channel_name, msg_data, template)
-            EmailService.send_email(email_subject, html_content)
+            # Queue email notification (sent by _email_sender)
+            await self._outbox.put((config, msg_data))
                 
         except Exception as e:
             print(f"❌ Error handling message: {e}")
@@ -237,7 +237,7 @@ class TestListener:
             print("="*70)
             print(f"🔹 Channel: {channel_name}")
             print(f"🔹 Message ID: {message.id}")
-            print(f"🔹 Date: {message.date.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"🔹 Date: {message.date.isoformat(' ', 'seconds')[:19]}")
             print(f"🔹 Sender ID: {message.sender_id}")
             if is_own_message:
                 print(f"🔹 ⚠️  This is YOUR message")